@@ -1,7 +1,8 @@
 #!/usr/bin/env python3
 import sqlite3
 import functools
-from datetime import datetime   # required for timestamp logging
+import time
+from query_logger import get_logger   # timestamps, timing and histograms
 
 # setup database automatically
 def setup_db():
@@ -18,11 +19,23 @@ setup_db()  # run this before anything else
 
 # decorator to log SQL queries
 def log_queries(func):
+    """
+    Times each query and hands it to the background query logger, which
+    writes a JSON line (timestamp, query, duration, errors) and keeps
+    per-query latency histograms. The call itself never waits on I/O.
+    """
     @functools.wraps(func)
     def wrapper(query, *args, **kwargs):
-        # log query with timestamp
-        print(f"[{datetime.now()}] Executing query: {query}")
-        return func(query, *args, **kwargs)
+        logger = get_logger()
+        error = None
+        start = time.perf_counter()
+        try:
+            return func(query, *args, **kwargs)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            logger.record(query, time.perf_counter() - start, error)
     return wrapper
 
 
@@ -40,3 +53,4 @@ def fetch_all_users(query):
 if __name__ == "__main__":
     users = fetch_all_users("SELECT * FROM users")
     print(users)
+    get_logger().flush()
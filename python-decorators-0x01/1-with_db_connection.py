@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 import sqlite3
 import functools
+from db_pool import get_pool
 
 # optional helper to ensure the DB and table exist (safe to leave in)
 def setup_db():
@@ -14,17 +15,16 @@ def setup_db():
 
 def with_db_connection(func):
     """
-    Decorator that opens a sqlite3 connection, passes it as the first argument
-    to the wrapped function, and closes the connection afterward.
+    Decorator that borrows a sqlite3 connection from the pool, passes it as
+    the first argument to the wrapped function, and returns it afterward.
+    Pooled connections are set up once (WAL, synchronous=NORMAL, mmap and
+    page cache pragmas, see db_pool) and keep their caches between calls.
     """
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        conn = sqlite3.connect('users.db')
-        try:
-            # inject conn as first argument
+        # inject conn as first argument
+        with get_pool().connection() as conn:
             return func(conn, *args, **kwargs)
-        finally:
-            conn.close()
     return wrapper
 
 @with_db_connection
@@ -1,32 +1,41 @@
 #!/usr/bin/env python3
-import sqlite3
 import functools
+from db_pool import get_pool
+from query_cache import invalidate_tables, tables_written
 
 
 def with_db_connection(func):
-    """Decorator that opens a sqlite3 connection, passes it to the function, and closes afterward"""
+    """Decorator that borrows a pooled sqlite3 connection (see db_pool), passes it to the function, and returns it afterward"""
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        conn = sqlite3.connect('users.db')
-        try:
+        with get_pool().connection() as conn:
             return func(conn, *args, **kwargs)
-        finally:
-            conn.close()
     return wrapper
 
 
 def transactional(func):
-    """Decorator to manage transactions (commit on success, rollback on error)"""
+    """
+    Decorator to manage transactions (commit on success, rollback on error).
+    Statements run inside are traced to see which tables they write; once
+    the commit succeeds, cached query results reading those tables are
+    invalidated (see query_cache).
+    """
     @functools.wraps(func)
     def wrapper(conn, *args, **kwargs):
+        written = set()
+        conn.set_trace_callback(lambda statement: written.update(tables_written(statement)))
         try:
             result = func(conn, *args, **kwargs)
             conn.commit()
-            return result
         except Exception as e:
             conn.rollback()
             print(f"Transaction failed, rolled back. Error: {e}")
             raise
+        finally:
+            conn.set_trace_callback(None)
+        if written:
+            invalidate_tables(written)
+        return result
     return wrapper
 
 
@@ -1,45 +1,44 @@
 #!/usr/bin/env python3
-import time
-import sqlite3
 import functools
+from db_pool import get_pool
+from retry_policy import RetryPolicy, async_retry, is_transient, retry
 
 
 def with_db_connection(func):
-    """Decorator that opens a sqlite3 connection, passes it to the function, and closes afterward"""
+    """Decorator that borrows a pooled sqlite3 connection (see db_pool), passes it to the function, and returns it afterward"""
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        conn = sqlite3.connect("users.db")
-        try:
+        with get_pool().connection() as conn:
             return func(conn, *args, **kwargs)
-        finally:
-            conn.close()
     return wrapper
 
 
-def retry_on_failure(retries=3, delay=2):
+def _report(error, attempt, delay):
+    print(f"Attempt {attempt} failed: {error}")
+    print(f"Retrying in {delay:.2f} seconds...")
+
+
+def retry_on_failure(retries=3, delay=2, max_elapsed=30, classifier=is_transient):
     """
     Decorator factory for retrying database operations.
     - retries: number of attempts before failing
-    - delay: seconds to wait between retries
+    - delay: base delay in seconds; each retry waits a random time between
+      0 and delay * 2 ** retry (exponential backoff with full jitter)
+    - max_elapsed: give up rather than retry past this many seconds
+    - classifier: which errors to retry; by default only transient sqlite3
+      errors such as "database is locked", so bugs fail immediately
+    Retries across the process are capped by retry_policy.default_budget.
     """
-    def decorator(func):
-        @functools.wraps(func)
-        def wrapper(*args, **kwargs):
-            attempt = 0
-            while attempt < retries:
-                try:
-                    return func(*args, **kwargs)
-                except Exception as e:
-                    attempt += 1
-                    print(f"Attempt {attempt} failed: {e}")
-                    if attempt < retries:
-                        print(f"Retrying in {delay} seconds...")
-                        time.sleep(delay)
-                    else:
-                        print("All retries failed.")
-                        raise
-        return wrapper
-    return decorator
+    policy = RetryPolicy(max_attempts=retries, base_delay=delay, max_delay=delay * 8,
+                         max_elapsed=max_elapsed, classifier=classifier)
+    return retry(policy, on_retry=_report)
+
+
+def async_retry_on_failure(retries=3, delay=2, max_elapsed=30, classifier=is_transient):
+    """retry_on_failure for coroutines: awaits between attempts instead of sleeping"""
+    policy = RetryPolicy(max_attempts=retries, base_delay=delay, max_delay=delay * 8,
+                         max_elapsed=max_elapsed, classifier=classifier)
+    return async_retry(policy, on_retry=_report)
 
 
 @with_db_connection
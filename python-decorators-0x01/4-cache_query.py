@@ -1,35 +1,45 @@
 #!/usr/bin/env python3
-import sqlite3
 import functools
+from db_pool import get_pool
+from query_cache import QueryCache, make_key, tables_read
 
-# simple in-memory cache
-query_cache = {}
+# bounded in-memory cache: LRU eviction past 1024 entries or 64 MB,
+# entries expire after 5 minutes
+query_cache = QueryCache(max_entries=1024, max_bytes=64 * 1024 * 1024, ttl=300)
+_miss = object()
 
 
 def with_db_connection(func):
-    """Decorator that opens a sqlite3 connection, passes it to the function, and closes afterward"""
+    """Decorator that borrows a pooled sqlite3 connection (see db_pool), passes it to the function, and returns it afterward"""
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        conn = sqlite3.connect("users.db")
-        try:
+        with get_pool().connection() as conn:
             return func(conn, *args, **kwargs)
-        finally:
-            conn.close()
     return wrapper
 
 
 def cache_query(func):
-    """Decorator that caches query results based on the SQL query string"""
+    """
+    Decorator that caches query results.
+    The key is the normalized SQL plus any parameters/other args, so
+    "SELECT * FROM users WHERE id = ?" with (1,) and (2,) are cached apart.
+    Entries remember the tables they read, and a @transactional commit
+    that writes to one of those tables drops them.
+    """
     @functools.wraps(func)
     def wrapper(conn, query, *args, **kwargs):
-        if query in query_cache:
+        key = make_key(query, args, **kwargs)
+        result = query_cache.get(key, _miss)
+        if result is not _miss:
             print(f"Cache hit for query: {query}")
-            return query_cache[query]
-        else:
-            print(f"Cache miss for query: {query}")
-            result = func(conn, query, *args, **kwargs)
-            query_cache[query] = result
             return result
+        print(f"Cache miss for query: {query}")
+        tables = tables_read(query)
+        # taken before the read: a commit landing during it makes set() a no-op
+        generation = query_cache.generation(tables)
+        result = func(conn, query, *args, **kwargs)
+        query_cache.set(key, result, tables=tables, generation=generation)
+        return result
     return wrapper
 
 
@@ -49,3 +59,5 @@ if __name__ == "__main__":
     # Second call → result comes from cache, no DB call
     users_again = fetch_users_with_cache(query="SELECT * FROM users")
     print(users_again)
+
+    print(query_cache.stats())
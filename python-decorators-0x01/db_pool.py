@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+DB_PATH = 'users.db'
+POOL_MAX_SIZE = 8
+# applied once to every new connection
+PRAGMAS = {
+    'journal_mode': 'WAL',          # readers don't block the writer
+    'synchronous': 'NORMAL',        # fsync at checkpoints only; safe with WAL
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,       # negative = KiB, so 64 MB of page cache
+    'busy_timeout': 5000,           # ms to wait on a locked database
+}
+
+
+class PoolTimeout(sqlite3.OperationalError):
+    """Raised when no connection became free within the timeout"""
+
+
+class SQLitePool:
+    """
+    Bounded pool of configured sqlite3 connections.
+    - connections are opened lazily up to max_size, set up once with PRAGMAS
+      and then reused, so their page cache and statement cache survive
+      between calls
+    - each thread gets back the connection it used last when it's free,
+      and otherwise the most recently returned one
+    """
+
+    def __init__(self, path=DB_PATH, max_size=POOL_MAX_SIZE, pragmas=None,
+                 cached_statements=256, timeout=30):
+        self.path = path
+        self.max_size = max_size
+        self.pragmas = PRAGMAS if pragmas is None else pragmas
+        self.cached_statements = cached_statements
+        self.timeout = timeout
+        self._idle = []  # returned connections, most recent last
+        self._size = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._local = threading.local()
+        self._stats = {'checkouts': 0, 'created': 0, 'discarded': 0}
+
+    def _open(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False,
+                               cached_statements=self.cached_statements)
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+
+    def acquire(self):
+        """Checks a connection out of the pool, opening one if needed"""
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            while True:
+                conn = self._take_idle()
+                if conn is not None:
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    break
+                # a wakeup can lose the race for the freed connection, so
+                # each wait only gets what is left of the timeout
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeout(f"No connection available after {self.timeout}s")
+                self._cond.wait(remaining)
+            self._stats['checkouts'] += 1
+        if conn is None:
+            try:
+                conn = self._open()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._stats['created'] += 1
+        self._local.last = conn
+        return conn
+
+    def _take_idle(self):
+        # caller holds the lock; prefers this thread's previous connection
+        if not self._idle:
+            return None
+        last = getattr(self._local, 'last', None)
+        for i in range(len(self._idle) - 1, -1, -1):
+            if self._idle[i] is last:
+                return self._idle.pop(i)
+        return self._idle.pop()
+
+    def release(self, conn, reusable=True):
+        """Returns a connection; open transactions are rolled back first"""
+        if reusable:
+            try:
+                if conn.in_transaction:
+                    conn.rollback()
+            except sqlite3.Error:
+                # closed, or the file went bad underneath it
+                reusable = False
+        with self._cond:
+            keep = reusable and not self._closed
+            if keep:
+                self._idle.append(conn)
+            else:
+                self._size -= 1
+                if not reusable:
+                    self._stats['discarded'] += 1
+            self._cond.notify()
+        if not keep:
+            conn.close()
+
+    @contextmanager
+    def connection(self):
+        """Borrows a connection for the duration of a with block"""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close_all(self):
+        """
+        Closes idle connections and marks the pool closed: checked-out
+        ones are closed on release instead of going back to the idle list
+        """
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+        for conn in idle:
+            conn.close()
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats['size'] = self._size
+            stats['idle'] = len(self._idle)
+        return stats
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Returns the process-wide pool; a forked child gets its own"""
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = SQLitePool()
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def configure_pool(**kwargs):
+    """Replaces the process-wide pool, e.g. with another path or max_size"""
+    global _pool, _pool_pid
+    with _pool_lock:
+        old, old_pid = _pool, _pool_pid
+        _pool, _pool_pid = SQLitePool(**kwargs), os.getpid()
+        pool = _pool
+    if old is not None and old_pid == os.getpid():
+        old.close_all()
+    return pool
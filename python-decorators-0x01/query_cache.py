@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+import re
+import sys
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+# string literals are kept as they are; whitespace anywhere else collapses
+_SQL_TOKENS = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")|\s+")
+_MISSING = object()
+# a table name, optionally schema-qualified and quoted
+_TABLE = r'[`"\[]?(?:\w+[`"\]]?\.[`"\[]?)?(\w+)[`"\]]?'
+_TABLE_NAME = re.compile(_TABLE)
+# one entry of a FROM list: a table and an optional alias
+_ALIAS_STOP = (r'WHERE|GROUP|ORDER|LIMIT|HAVING|UNION|EXCEPT|INTERSECT|WINDOW|JOIN|INNER'
+               r'|LEFT|RIGHT|FULL|OUTER|CROSS|NATURAL|ON|USING')
+_FROM_ITEM = (r'[`"\[]?(?:\w+[`"\]]?\.[`"\[]?)?\w+[`"\]]?'
+              r'(?:\s+(?:AS\s+)?(?!(?:' + _ALIAS_STOP + r')\b)\w+)?')
+# FROM a, b AS x, main.c ... and JOIN d: every table of a comma list counts
+_READS = re.compile(r'\b(?:FROM|JOIN)\s+(' + _FROM_ITEM + r'(?:\s*,\s*' + _FROM_ITEM + r')*)',
+                    re.IGNORECASE)
+_WRITES = re.compile(
+    r'^\s*(?:INSERT(?:\s+OR\s+\w+)?\s+INTO|REPLACE\s+INTO|UPDATE(?:\s+OR\s+\w+)?'
+    r'|DELETE\s+FROM|ALTER\s+TABLE|DROP\s+TABLE(?:\s+IF\s+EXISTS)?'
+    r'|CREATE\s+TABLE(?:\s+IF\s+NOT\s+EXISTS)?)\s+' + _TABLE,
+    re.IGNORECASE)
+_WRITE_VERBS = ('INSERT', 'REPLACE', 'UPDATE', 'DELETE', 'ALTER', 'DROP', 'CREATE', 'WITH')
+# stands for "any table": entries that depend on it are dropped by every write
+ANY_TABLE = '*'
+# every QueryCache, so a commit can invalidate all of them
+_caches = weakref.WeakSet()
+
+
+def normalize_sql(query):
+    """Collapses whitespace outside string literals and drops a trailing ';'"""
+    normalized = _SQL_TOKENS.sub(lambda m: m.group(1) or ' ', query).strip()
+    return normalized.rstrip(';').rstrip()
+
+
+def tables_read(query):
+    """Tables a query reads from; {ANY_TABLE} if none could be found"""
+    tables = set()
+    for from_list in _READS.findall(query):
+        for item in from_list.split(','):
+            tables.add(_TABLE_NAME.match(item.strip()).group(1).lower())
+    return tables or {ANY_TABLE}
+
+
+def tables_written(statement):
+    """
+    Tables a statement writes to: an empty set for reads (SELECT, PRAGMA,
+    BEGIN...), {ANY_TABLE} for a write whose target can't be worked out
+    """
+    verb = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ''
+    if verb not in _WRITE_VERBS:
+        return set()
+    match = _WRITES.match(statement)
+    return {match.group(1).lower()} if match else {ANY_TABLE}
+
+
+def invalidate_tables(tables):
+    """Drops the entries of every QueryCache that read from any of tables"""
+    for cache in list(_caches):
+        cache.invalidate_tables(tables)
+
+
+def _freeze(value):
+    """Turns lists/dicts into something hashable so they can be part of a key"""
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (set, frozenset)):
+        return frozenset(_freeze(v) for v in value)
+    return value
+
+
+def make_key(query, params=(), /, **kwargs):
+    """
+    Cache key: the normalized SQL plus its bound parameters and other args.
+    query and params are positional-only, so the caller's own keyword
+    arguments may use those names too.
+    """
+    return (normalize_sql(query), _freeze(params), _freeze(kwargs))
+
+
+def result_size(result):
+    """Rough size in bytes of a query result (list of row tuples)"""
+    size = sys.getsizeof(result)
+    if isinstance(result, (list, tuple)):
+        for row in result:
+            size += sys.getsizeof(row)
+            if isinstance(row, (list, tuple)):
+                size += sum(sys.getsizeof(value) for value in row)
+    return size
+
+
+class QueryCache:
+    """
+    Thread-safe LRU cache for query results.
+    - max_entries / max_bytes: least recently used entries are evicted
+      once either limit is exceeded
+    - ttl: default seconds an entry stays fresh (None = never expires)
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=64 * 1024 * 1024, ttl=300):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (result, size, expires_at, tables)
+        self._by_table = {}            # table -> keys of the entries reading it
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._generations = {}         # table -> number of writes committed to it
+        self._wildcard_writes = 0      # writes whose target couldn't be parsed
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0,
+                       'invalidations': 0, 'stale_sets': 0}
+        _caches.add(self)
+
+    def get(self, key, default=None):
+        """Returns the cached result, or default if absent or expired"""
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is _MISSING:
+                self._stats['misses'] += 1
+                return default
+            result, size, expires_at, _ = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                self._remove(key)
+                self._stats['expirations'] += 1
+                self._stats['misses'] += 1
+                return default
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return result
+
+    def generation(self, tables):
+        """
+        Snapshot of the write counters of tables. Take it before running
+        the query and pass it to set(): if a write to one of the tables
+        was committed in between, the result may be stale and isn't stored.
+        """
+        with self._lock:
+            return self._generation(tables)
+
+    def _generation(self, tables):
+        # caller holds the lock
+        return self._wildcard_writes, tuple(self._generations.get(table, 0)
+                                            for table in sorted(tables))
+
+    def set(self, key, result, ttl=None, tables=(ANY_TABLE,), generation=None):
+        """
+        Stores a result; ttl overrides the cache default for this entry.
+        tables are the tables the result was read from (see tables_read);
+        a committed write to any of them drops the entry. generation is
+        what generation(tables) returned before the query ran.
+        """
+        ttl = self.ttl if ttl is None else ttl
+        size = result_size(result)
+        if size > self.max_bytes:
+            return  # would evict everything else and still not fit
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            if generation is not None and generation != self._generation(tables):
+                self._stats['stale_sets'] += 1
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (result, size, expires_at, frozenset(tables))
+            for table in tables:
+                self._by_table.setdefault(table, set()).add(key)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._stats['evictions'] += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def invalidate_tables(self, tables):
+        """Drops the entries that read from any of tables"""
+        with self._lock:
+            if ANY_TABLE in tables:
+                # a write to an unknown table may have touched any of them
+                self._wildcard_writes += 1
+            else:
+                # readers of unknown tables depend on every write
+                for table in {*tables, ANY_TABLE}:
+                    self._generations[table] = self._generations.get(table, 0) + 1
+            if ANY_TABLE in tables:
+                keys = list(self._entries)
+            else:
+                keys = set(self._by_table.get(ANY_TABLE, ()))
+                for table in tables:
+                    keys.update(self._by_table.get(table, ()))
+            for key in keys:
+                self._remove(key)
+            self._stats['invalidations'] += len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_table.clear()
+            self._bytes = 0
+
+    def _remove(self, key):
+        # caller holds the lock
+        _, size, _, tables = self._entries.pop(key)
+        self._bytes -= size
+        for table in tables:
+            keys = self._by_table[table]
+            keys.discard(key)
+            if not keys:
+                del self._by_table[table]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def stats(self):
+        """Returns hit/miss/eviction counters plus current entries and bytes"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+            stats['bytes'] = self._bytes
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+import atexit
+import bisect
+import json
+import queue
+import random
+import re
+import sys
+import threading
+import time
+from datetime import datetime
+
+# upper bounds (ms) of the latency histogram buckets; the last is +Inf
+LATENCY_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_SPACES = re.compile(r"\s+")
+
+_STOP = object()
+
+
+def fingerprint(query):
+    """
+    Reduces a query to its shape: literals become ?, IN lists collapse,
+    whitespace is normalized. "... WHERE id = 1" and "... WHERE id = 2"
+    share a fingerprint.
+    """
+    shape = _LITERALS.sub('?', query)
+    shape = _IN_LISTS.sub('(?+)', shape)
+    return _SPACES.sub(' ', shape).strip().rstrip(';').rstrip()
+
+
+class LatencyHistogram:
+    """Bucketed latencies of one query fingerprint"""
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.errors = 0
+
+    def add(self, duration_ms, failed=False):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS_MS, duration_ms)] += 1
+        self.count += 1
+        self.total_ms += duration_ms
+        self.max_ms = max(self.max_ms, duration_ms)
+        self.errors += failed
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th quantile"""
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS_MS, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.max_ms
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'avg_ms': self.total_ms / self.count if self.count else 0.0,
+            'max_ms': self.max_ms,
+            'p50_ms': self.quantile(0.5),
+            'p99_ms': self.quantile(0.99),
+            'buckets': dict(zip([*map(str, LATENCY_BUCKETS_MS), '+Inf'], self.counts)),
+        }
+
+
+class QueryLogger:
+    """
+    Structured, non-blocking query log.
+    - record() only timestamps and enqueues; formatting, writing and
+      histogram updates happen on a background writer thread
+    - sample_rate: fraction of ordinary queries written out; slow ones
+      (>= slow_ms) and failures are always written
+    - every query, sampled or not, counts toward its fingerprint's
+      latency histogram (see dump() and render_metrics())
+    """
+
+    def __init__(self, stream=None, sample_rate=1.0, slow_ms=100.0):
+        self.stream = stream or sys.stderr
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.dropped = 0
+        # SimpleQueue is a C-level queue: put() never blocks and takes no
+        # Python-level lock
+        self._queue = queue.SimpleQueue()
+        self._histograms = {}
+        self._lock = threading.Lock()  # guards _histograms for dump()
+        self._thread = threading.Thread(target=self._drain, name='query-logger', daemon=True)
+        self._thread.start()
+
+    def record(self, query, duration, error=None, params=None):
+        """Queues one executed query; duration is in seconds"""
+        self._queue.put((time.time(), query, duration * 1000.0, error, params))
+
+    def _drain(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            if isinstance(item, threading.Event):
+                self.stream.flush()
+                item.set()
+                continue
+            try:
+                self._write(*item)
+            except Exception:
+                self.dropped += 1
+
+    def _write(self, timestamp, query, duration_ms, error, params):
+        shape = fingerprint(query)
+        with self._lock:
+            histogram = self._histograms.get(shape)
+            if histogram is None:
+                histogram = self._histograms[shape] = LatencyHistogram()
+            histogram.add(duration_ms, error is not None)
+
+        slow = duration_ms >= self.slow_ms
+        if not slow and error is None and random.random() >= self.sample_rate:
+            return
+        entry = {
+            'ts': datetime.fromtimestamp(timestamp).isoformat(),
+            'query': query,
+            'fingerprint': shape,
+            'duration_ms': round(duration_ms, 3),
+            'slow': slow,
+        }
+        if params is not None:
+            entry['params'] = params
+        if error is not None:
+            entry['error'] = f"{type(error).__name__}: {error}"
+        self.stream.write(json.dumps(entry, default=str) + '\n')
+
+    def flush(self, timeout=5):
+        """
+        Waits until everything recorded so far has been written. Returns
+        False at once if the logger is closed, as nothing is left to write.
+        """
+        if not self._thread.is_alive():
+            return False
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self):
+        """Writes out what's pending and stops the writer; later calls do nothing"""
+        if not self._thread.is_alive():
+            return
+        self.flush()
+        self._queue.put(_STOP)
+        self._thread.join(timeout=5)
+
+    def dump(self):
+        """Returns latency stats per fingerprint, after flushing pending records"""
+        self.flush()
+        with self._lock:
+            return {shape: h.to_dict() for shape, h in self._histograms.items()}
+
+    def render_metrics(self):
+        """The histograms in the Prometheus text format"""
+        self.flush()
+        lines = ['# TYPE query_duration_ms histogram']
+        with self._lock:
+            for shape, h in sorted(self._histograms.items()):
+                label = shape.replace('\\', '\\\\').replace('"', '\\"')
+                seen = 0
+                for bound, count in zip([*map(str, LATENCY_BUCKETS_MS), '+Inf'], h.counts):
+                    seen += count
+                    lines.append(f'query_duration_ms_bucket{{query="{label}",le="{bound}"}} {seen}')
+                lines.append(f'query_duration_ms_sum{{query="{label}"}} {h.total_ms}')
+                lines.append(f'query_duration_ms_count{{query="{label}"}} {h.count}')
+        return '\n'.join(lines) + '\n'
+
+
+_logger = None
+_logger_lock = threading.Lock()
+
+
+def get_logger():
+    """Returns the process-wide QueryLogger, starting it on first use"""
+    global _logger
+    with _logger_lock:
+        if _logger is None:
+            _logger = QueryLogger()
+            atexit.register(_logger.close)
+        return _logger
+
+
+def configure_logger(**kwargs):
+    """Replaces the process-wide logger, e.g. with a file stream or a lower sample_rate"""
+    global _logger
+    with _logger_lock:
+        old, _logger = _logger, QueryLogger(**kwargs)
+        atexit.register(_logger.close)
+        logger = _logger
+    if old is not None:
+        atexit.unregister(old.close)
+        old.close()
+    return logger
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+import asyncio
+import functools
+import random
+import sqlite3
+import threading
+import time
+
+# sqlite3.OperationalError messages worth another attempt; anything else
+# (syntax errors, missing tables, ...) fails the same way every time
+TRANSIENT_SQLITE_MESSAGES = ('database is locked', 'database table is locked',
+                             'database is busy', 'disk i/o error')
+
+
+def is_transient(error):
+    """Default classifier: only lock/busy style sqlite3 errors are retried"""
+    if isinstance(error, sqlite3.OperationalError):
+        message = str(error).lower()
+        return any(text in message for text in TRANSIENT_SQLITE_MESSAGES)
+    return False
+
+
+def retry_on(*types, messages=None):
+    """
+    Builds a classifier that retries instances of types, optionally only
+    when the message contains one of messages
+    """
+    def classifier(error):
+        if not isinstance(error, types):
+            return False
+        if messages is None:
+            return True
+        message = str(error).lower()
+        return any(text.lower() in message for text in messages)
+    return classifier
+
+
+class RetryBudget:
+    """
+    Token bucket that caps retries per process, so a struggling database
+    isn't hit with a retry storm on top of the normal load.
+    - every call earns ratio tokens, every retry spends one
+    - min_per_second tokens are added per second regardless of traffic
+    - at most capacity tokens are kept
+    """
+
+    def __init__(self, ratio=0.2, min_per_second=1.0, capacity=10.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        # caller holds the lock
+        self._tokens = min(self.capacity,
+                           self._tokens + (now - self._updated) * self.min_per_second)
+        self._updated = now
+
+    def deposit(self):
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self.capacity, self._tokens + self.ratio)
+
+    def withdraw(self):
+        """Takes a token for one retry; False when the budget is spent"""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+# shared by every policy that doesn't bring its own
+default_budget = RetryBudget()
+
+
+class RetryPolicy:
+    """
+    When and how long to wait before retrying.
+    - max_attempts: total tries, the first one included
+    - base_delay / max_delay: backoff is base_delay * 2 ** retry, capped
+      at max_delay, with full jitter (a uniform draw from 0 to that)
+    - max_elapsed: no retry is started that would end past this many
+      seconds after the first attempt
+    - classifier: decides which exceptions are worth retrying
+    - budget: a RetryBudget, None for default_budget
+    """
+
+    def __init__(self, max_attempts=3, base_delay=0.1, max_delay=5.0, max_elapsed=30.0,
+                 classifier=is_transient, budget=None):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_elapsed = max_elapsed
+        self.classifier = classifier
+        self.budget = budget or default_budget
+
+    def backoff(self, retry):
+        """Seconds to wait before retry number retry (0 for the first)"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** retry))
+
+    def next_delay(self, error, attempt, started):
+        """
+        The delay before the next attempt after attempt (1-based) failed
+        with error, or None if it shouldn't be retried
+        """
+        if attempt >= self.max_attempts or not self.classifier(error):
+            return None
+        delay = self.backoff(attempt - 1)
+        if self.max_elapsed is not None and \
+                time.monotonic() + delay - started > self.max_elapsed:
+            return None
+        if not self.budget.withdraw():
+            return None
+        return delay
+
+
+def retry(policy=None, on_retry=None):
+    """
+    Decorator that retries a function according to policy.
+    on_retry(error, attempt, delay) is called before each wait.
+    """
+    policy = policy or RetryPolicy()
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            policy.budget.deposit()
+            started = time.monotonic()
+            attempt = 0
+            while True:
+                attempt += 1
+                try:
+                    return func(*args, **kwargs)
+                except Exception as e:
+                    delay = policy.next_delay(e, attempt, started)
+                    if delay is None:
+                        raise
+                    if on_retry is not None:
+                        on_retry(e, attempt, delay)
+                    time.sleep(delay)
+        return wrapper
+    return decorator
+
+
+def async_retry(policy=None, on_retry=None):
+    """retry() for coroutine functions: waits with asyncio.sleep instead of blocking"""
+    policy = policy or RetryPolicy()
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            policy.budget.deposit()
+            started = time.monotonic()
+            attempt = 0
+            while True:
+                attempt += 1
+                try:
+                    return await func(*args, **kwargs)
+                except Exception as e:
+                    delay = policy.next_delay(e, attempt, started)
+                    if delay is None:
+                        raise
+                    if on_retry is not None:
+                        on_retry(e, attempt, delay)
+                    await asyncio.sleep(delay)
+        return wrapper
+    return decorator
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Unit tests for db_pool.py
+
+Covers:
+- connection reuse and the per-thread preference
+- the checkout timeout being a real deadline
+- closed pools closing connections on release
+"""
+
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+from db_pool import PoolTimeout, SQLitePool, configure_pool
+
+
+class TestSQLitePool(unittest.TestCase):
+    """SQLitePool over a scratch database file"""
+
+    def setUp(self):
+        self.scratch = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.scratch, ignore_errors=True)
+        self.path = os.path.join(self.scratch, 'users.db')
+
+    def make_pool(self, **kwargs):
+        pool = SQLitePool(path=self.path, **kwargs)
+        self.addCleanup(pool.close_all)
+        return pool
+
+    def test_reuse(self):
+        """A released connection is handed out again, pragmas applied"""
+        pool = self.make_pool()
+        with pool.connection() as conn:
+            mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+        with pool.connection() as again:
+            self.assertIs(again, conn)
+        self.assertEqual(mode, 'wal')
+        self.assertEqual(pool.stats()['created'], 1)
+
+    def test_open_transaction_rolled_back(self):
+        """A connection comes back without the previous user's transaction"""
+        pool = self.make_pool()
+        with pool.connection() as conn:
+            conn.execute("CREATE TABLE t (x)")
+            conn.commit()
+            conn.execute("INSERT INTO t VALUES (1)")
+        with pool.connection() as conn:
+            self.assertFalse(conn.in_transaction)
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM t").fetchone()[0], 0)
+
+    def test_timeout(self):
+        """acquire() gives up once the pool has been full for timeout seconds"""
+        pool = self.make_pool(max_size=1, timeout=0.1)
+        held = pool.acquire()
+        self.addCleanup(pool.release, held)
+        with self.assertRaises(PoolTimeout):
+            pool.acquire()
+        self.assertTrue(issubclass(PoolTimeout, sqlite3.OperationalError))
+
+    def test_timeout_is_a_deadline(self):
+        """Wakeups that find no free connection don't restart the wait"""
+        pool = self.make_pool(max_size=1, timeout=0.3)
+        held = pool.acquire()
+        self.addCleanup(pool.release, held)
+        stop = threading.Event()
+
+        def nudge():
+            # bounded, so a regression fails the test instead of hanging it
+            until = time.monotonic() + 2
+            while time.monotonic() < until and not stop.wait(0.05):
+                with pool._cond:
+                    pool._cond.notify_all()
+
+        nudger = threading.Thread(target=nudge)
+        nudger.start()
+        self.addCleanup(nudger.join)
+        self.addCleanup(stop.set)
+        start = time.monotonic()
+        with self.assertRaises(PoolTimeout):
+            pool.acquire()
+        self.assertLess(time.monotonic() - start, 1.0)
+
+    def test_release_to_closed_pool(self):
+        """A connection out while the pool is replaced is closed on release"""
+        old = configure_pool(path=self.path)
+        conn = old.acquire()
+        self.addCleanup(configure_pool)
+        configure_pool(path=self.path)
+        old.release(conn)
+        self.assertEqual(old.stats()['size'], 0)
+        self.assertEqual(old.stats()['idle'], 0)
+        with self.assertRaises(sqlite3.ProgrammingError):
+            conn.execute("SELECT 1")
+
+
+if __name__ == '__main__':
+    unittest.main()
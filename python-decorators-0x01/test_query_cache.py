@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Unit tests for query_cache.py and its use by @cache_query / @transactional
+
+Covers:
+- which tables a query reads and a statement writes
+- LRU eviction and TTL expiry
+- table invalidation, including a commit racing a cache miss
+- @transactional commits dropping the cached reads of the tables they wrote
+"""
+
+import contextlib
+import io
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+import unittest
+from db_pool import configure_pool
+from query_cache import (ANY_TABLE, QueryCache, make_key, tables_read,
+                         tables_written)
+
+cache_module = __import__('4-cache_query')
+transactional_module = __import__('2-transactional')
+
+
+class TestTablesRead(unittest.TestCase):
+    """tables_read() finds every table a SELECT depends on"""
+
+    def test_queries(self):
+        """FROM, JOIN, comma lists, aliases, quoting and schemas"""
+        cases = {
+            "SELECT * FROM users": {'users'},
+            "select name from Users where id = 1": {'users'},
+            "SELECT * FROM users u JOIN orders o ON o.user_id = u.id": {'users', 'orders'},
+            "SELECT * FROM users, orders WHERE orders.user_id = users.id": {'users', 'orders'},
+            "SELECT * FROM users AS u, main.orders o, `items` WHERE 1": {'users', 'orders', 'items'},
+            "SELECT * FROM users WHERE id IN (SELECT user_id FROM orders)": {'users', 'orders'},
+        }
+        for query, tables in cases.items():
+            with self.subTest(query=query):
+                self.assertEqual(tables_read(query), tables)
+
+    def test_unknown(self):
+        """A query with no recognizable table depends on every table"""
+        self.assertEqual(tables_read("SELECT 1"), {ANY_TABLE})
+
+
+class TestTablesWritten(unittest.TestCase):
+    """tables_written() finds the target of a write"""
+
+    def test_statements(self):
+        """Reads write nothing; writes name their table"""
+        cases = {
+            "SELECT * FROM users": set(),
+            "PRAGMA table_info(users)": set(),
+            "BEGIN": set(),
+            "UPDATE users SET email = ? WHERE id = ?": {'users'},
+            "INSERT OR REPLACE INTO main.Users VALUES (1)": {'users'},
+            "DELETE FROM orders WHERE id = 1": {'orders'},
+            "ALTER TABLE users ADD COLUMN email TEXT": {'users'},
+            "DROP TABLE IF EXISTS orders": {'orders'},
+            "WITH x AS (SELECT 1) INSERT INTO users SELECT * FROM x": {ANY_TABLE},
+        }
+        for statement, tables in cases.items():
+            with self.subTest(statement=statement):
+                self.assertEqual(tables_written(statement), tables)
+
+
+class TestQueryCache(unittest.TestCase):
+    """QueryCache eviction, expiry and invalidation"""
+
+    def setUp(self):
+        self.cache = QueryCache(max_entries=3, ttl=None)
+
+    def test_make_key(self):
+        """Whitespace doesn't matter, parameters do"""
+        self.assertEqual(make_key("SELECT *  FROM users;"), make_key("SELECT * FROM users"))
+        self.assertNotEqual(make_key("SELECT * FROM users WHERE id = ?", (1,)),
+                            make_key("SELECT * FROM users WHERE id = ?", (2,)))
+
+    def test_make_key_kwargs(self):
+        """Keyword arguments named params or query don't clash"""
+        key = make_key("SELECT * FROM users WHERE id = ?", params=(1,), query='x')
+        self.assertNotEqual(key, make_key("SELECT * FROM users WHERE id = ?", params=(2,)))
+
+    def test_lru_eviction(self):
+        """The least recently used entry goes first"""
+        for key in 'abc':
+            self.cache.set(key, [(key,)])
+        self.cache.get('a')
+        self.cache.set('d', [('d',)])
+        self.assertNotIn('b', self.cache)
+        self.assertIn('a', self.cache)
+        self.assertEqual(self.cache.stats()['evictions'], 1)
+
+    def test_ttl(self):
+        """An expired entry is a miss"""
+        self.cache.set('a', [(1,)], ttl=0.01)
+        time.sleep(0.02)
+        self.assertIsNone(self.cache.get('a'))
+        self.assertEqual(self.cache.stats()['expirations'], 1)
+
+    def test_invalidate_tables(self):
+        """Only entries reading a written table are dropped"""
+        self.cache.set('users', [(1,)], tables={'users'})
+        self.cache.set('orders', [(2,)], tables={'orders'})
+        self.cache.set('unknown', [(3,)], tables={ANY_TABLE})
+        self.cache.invalidate_tables({'users'})
+        self.assertNotIn('users', self.cache)
+        self.assertIn('orders', self.cache)
+        # an entry whose tables weren't known can't be trusted after any write
+        self.assertNotIn('unknown', self.cache)
+
+    def test_invalidate_any_table(self):
+        """A write to an unknown table drops everything"""
+        self.cache.set('users', [(1,)], tables={'users'})
+        self.cache.set('orders', [(2,)], tables={'orders'})
+        self.cache.invalidate_tables({ANY_TABLE})
+        self.assertEqual(len(self.cache), 0)
+
+    def test_commit_during_read(self):
+        """A result read before a commit to its table isn't stored"""
+        generation = self.cache.generation({'users'})
+        self.cache.invalidate_tables({'users'})
+        self.cache.set('users', [(1,)], tables={'users'}, generation=generation)
+        self.assertNotIn('users', self.cache)
+        self.assertEqual(self.cache.stats()['stale_sets'], 1)
+
+    def test_commit_to_other_table_during_read(self):
+        """A commit to an unrelated table doesn't block the store"""
+        generation = self.cache.generation({'users'})
+        self.cache.invalidate_tables({'orders'})
+        self.cache.set('users', [(1,)], tables={'users'}, generation=generation)
+        self.assertIn('users', self.cache)
+
+    def test_unknown_commit_during_read(self):
+        """A commit to an unknown table blocks every store"""
+        generation = self.cache.generation({'users'})
+        self.cache.invalidate_tables({ANY_TABLE})
+        self.cache.set('users', [(1,)], tables={'users'}, generation=generation)
+        self.assertNotIn('users', self.cache)
+
+
+class TestTransactionalInvalidation(unittest.TestCase):
+    """@transactional and @cache_query against a scratch users.db"""
+
+    def setUp(self):
+        self.scratch = tempfile.mkdtemp()
+        path = os.path.join(self.scratch, 'users.db')
+        with contextlib.closing(sqlite3.connect(path)) as conn:
+            conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT, email TEXT)")
+            conn.executemany("INSERT INTO users (name, email) VALUES (?, ?)",
+                             [('Ann', 'ann@old.com'), ('Bob', 'bob@old.com')])
+            conn.commit()
+        self.pool = configure_pool(path=path)
+        cache_module.query_cache.clear()
+        self.output = io.StringIO()
+        redirect = contextlib.redirect_stdout(self.output)
+        redirect.__enter__()
+        self.addCleanup(redirect.__exit__, None, None, None)
+
+    def tearDown(self):
+        self.pool.close_all()
+        shutil.rmtree(self.scratch, ignore_errors=True)
+
+    def fetch(self, query="SELECT email FROM users ORDER BY id"):
+        return cache_module.fetch_users_with_cache(query=query)
+
+    def test_commit_invalidates(self):
+        """The next read after a committed update sees the new email"""
+        hits = cache_module.query_cache.stats()['hits']
+        self.assertEqual(self.fetch()[0], ('ann@old.com',))
+        self.assertEqual(self.fetch()[0], ('ann@old.com',))
+        self.assertEqual(cache_module.query_cache.stats()['hits'], hits + 1)
+        transactional_module.update_user_email(user_id=1, new_email='ann@new.com')
+        self.assertEqual(self.fetch()[0], ('ann@new.com',))
+
+    def test_rollback_keeps_cache(self):
+        """A failed transaction writes nothing, so nothing is dropped"""
+        self.fetch()
+
+        @transactional_module.with_db_connection
+        @transactional_module.transactional
+        def broken(conn):
+            conn.execute("UPDATE users SET email = 'x' WHERE id = 1")
+            raise RuntimeError('boom')
+
+        with self.assertRaises(RuntimeError):
+            broken()
+        self.assertEqual(len(cache_module.query_cache), 1)
+        self.assertEqual(self.fetch()[0], ('ann@old.com',))
+
+    def test_params_keyword(self):
+        """Bound parameters passed as params=... are part of the key"""
+        @cache_module.with_db_connection
+        @cache_module.cache_query
+        def fetch_email(conn, query, params=()):
+            return conn.execute(query, params).fetchall()
+
+        query = "SELECT email FROM users WHERE id = ?"
+        hits = cache_module.query_cache.stats()['hits']
+        self.assertEqual(fetch_email(query, params=(1,)), [('ann@old.com',)])
+        self.assertEqual(fetch_email(query, params=(2,)), [('bob@old.com',)])
+        self.assertEqual(fetch_email(query, params=(1,)), [('ann@old.com',)])
+        self.assertEqual(cache_module.query_cache.stats()['hits'], hits + 1)
+
+    def test_commit_racing_a_miss(self):
+        """A commit landing while a miss reads the database isn't masked"""
+        @cache_module.with_db_connection
+        @cache_module.cache_query
+        def slow_fetch(conn, query):
+            rows = conn.execute(query).fetchall()
+            # another writer commits after our read, before we store it
+            transactional_module.update_user_email(user_id=1, new_email='ann@new.com')
+            return rows
+
+        query = "SELECT email FROM users ORDER BY id"
+        self.assertEqual(slow_fetch(query)[0], ('ann@old.com',))
+        self.assertEqual(len(cache_module.query_cache), 0)
+        self.assertEqual(self.fetch(query)[0], ('ann@new.com',))
+
+
+if __name__ == '__main__':
+    unittest.main()
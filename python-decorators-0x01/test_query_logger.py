@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Unit tests for query_logger.py
+
+Covers:
+- query fingerprints
+- sampling and the slow-query threshold
+- latency histograms and their Prometheus rendering
+- closing and replacing loggers
+"""
+
+import io
+import json
+import time
+import unittest
+from unittest.mock import patch
+import query_logger
+from query_logger import LatencyHistogram, QueryLogger, fingerprint
+
+
+class TestFingerprint(unittest.TestCase):
+    """fingerprint() reduces queries to their shape"""
+
+    def test_shapes(self):
+        """Literals, IN lists, whitespace and trailing ';' are normalized"""
+        cases = {
+            "SELECT * FROM users WHERE id = 1": "SELECT * FROM users WHERE id = ?",
+            "SELECT * FROM users WHERE name = 'O''Brien'": "SELECT * FROM users WHERE name = ?",
+            "SELECT *\n  FROM users WHERE id IN (1, 2, 3);": "SELECT * FROM users WHERE id IN (?+)",
+            "SELECT * FROM t2 WHERE x = 1.5": "SELECT * FROM t2 WHERE x = ?",
+        }
+        for query, shape in cases.items():
+            with self.subTest(query=query):
+                self.assertEqual(fingerprint(query), shape)
+
+    def test_same_shape(self):
+        """Queries differing only in their literals share a fingerprint"""
+        self.assertEqual(fingerprint("SELECT * FROM users WHERE id IN (1)"),
+                         fingerprint("SELECT * FROM users WHERE id IN (4, 5)"))
+
+
+class TestLatencyHistogram(unittest.TestCase):
+    """LatencyHistogram bucketing and quantiles"""
+
+    def test_buckets_and_quantiles(self):
+        """Each duration lands in the first bucket bounding it"""
+        histogram = LatencyHistogram()
+        for duration_ms in [0.05] * 50 + [3] * 49 + [20000]:
+            histogram.add(duration_ms)
+        stats = histogram.to_dict()
+        self.assertEqual(stats['count'], 100)
+        self.assertEqual(stats['buckets']['0.1'], 50)
+        self.assertEqual(stats['buckets']['5'], 49)
+        self.assertEqual(stats['buckets']['+Inf'], 1)
+        self.assertEqual(stats['p50_ms'], 0.1)
+        self.assertEqual(stats['p99_ms'], 5)
+        self.assertEqual(stats['max_ms'], 20000)
+        self.assertEqual(histogram.quantile(1.0), 20000)
+
+    def test_errors(self):
+        """Failed queries are counted separately"""
+        histogram = LatencyHistogram()
+        histogram.add(1, failed=True)
+        histogram.add(1)
+        self.assertEqual(histogram.to_dict()['errors'], 1)
+
+
+class TestQueryLogger(unittest.TestCase):
+    """QueryLogger writing to an in-memory stream"""
+
+    def make_logger(self, **kwargs):
+        self.stream = io.StringIO()
+        logger = QueryLogger(stream=self.stream, **kwargs)
+        self.addCleanup(logger.close)
+        return logger
+
+    def entries(self):
+        return [json.loads(line) for line in self.stream.getvalue().splitlines()]
+
+    def test_entry(self):
+        """Each query becomes one JSON line"""
+        logger = self.make_logger()
+        logger.record("SELECT * FROM users WHERE id = ?", 0.002, params=(1,))
+        logger.flush()
+        entry, = self.entries()
+        self.assertEqual(entry['query'], "SELECT * FROM users WHERE id = ?")
+        self.assertEqual(entry['duration_ms'], 2.0)
+        self.assertEqual(entry['params'], [1])
+        self.assertFalse(entry['slow'])
+        self.assertNotIn('error', entry)
+
+    def test_sampling(self):
+        """Unsampled queries aren't written but still count in the histograms"""
+        logger = self.make_logger(sample_rate=0.0, slow_ms=100)
+        for i in range(10):
+            logger.record(f"SELECT * FROM users WHERE id = {i}", 0.001)
+        logger.record("SELECT * FROM users WHERE id = 99", 0.5)
+        logger.record("SELECT * FROM nowhere", 0.001, error=ValueError('no such table'))
+        stats = logger.dump()
+        entries = self.entries()
+        self.assertEqual(len(entries), 2)
+        self.assertTrue(entries[0]['slow'])
+        self.assertEqual(entries[1]['error'], 'ValueError: no such table')
+        self.assertEqual(stats["SELECT * FROM users WHERE id = ?"]['count'], 11)
+        self.assertEqual(stats["SELECT * FROM nowhere"]['errors'], 1)
+
+    def test_partial_sampling(self):
+        """sample_rate is the fraction of ordinary queries written"""
+        logger = self.make_logger(sample_rate=0.5)
+        with patch('query_logger.random.random', side_effect=[0.2, 0.7] * 5):
+            for _ in range(10):
+                logger.record("SELECT 1", 0.001)
+            logger.flush()
+        self.assertEqual(len(self.entries()), 5)
+
+    def test_slow_threshold(self):
+        """Queries at or past slow_ms are flagged slow"""
+        logger = self.make_logger(slow_ms=10)
+        logger.record("SELECT 1", 0.0099)
+        logger.record("SELECT 1", 0.010)
+        logger.flush()
+        self.assertEqual([entry['slow'] for entry in self.entries()], [False, True])
+
+    def test_render_metrics(self):
+        """Buckets are cumulative and the fingerprint is the label"""
+        logger = self.make_logger(sample_rate=0.0)
+        logger.record('SELECT "a" FROM t', 0.0002)
+        logger.record('SELECT "a" FROM t', 0.003)
+        lines = logger.render_metrics().splitlines()
+        self.assertEqual(lines[0], '# TYPE query_duration_ms histogram')
+        label = 'query="SELECT \\"a\\" FROM t"'
+        self.assertIn(f'query_duration_ms_bucket{{{label},le="0.1"}} 0', lines)
+        self.assertIn(f'query_duration_ms_bucket{{{label},le="0.25"}} 1', lines)
+        self.assertIn(f'query_duration_ms_bucket{{{label},le="5"}} 2', lines)
+        self.assertIn(f'query_duration_ms_bucket{{{label},le="+Inf"}} 2', lines)
+        self.assertIn(f'query_duration_ms_count{{{label}}} 2', lines)
+
+    def test_close_twice(self):
+        """Closing again, or flushing a closed logger, returns at once"""
+        logger = self.make_logger()
+        logger.record("SELECT 1", 0.001)
+        logger.close()
+        self.assertEqual(len(self.entries()), 1)
+        start = time.monotonic()
+        logger.close()
+        self.assertFalse(logger.flush())
+        self.assertLess(time.monotonic() - start, 1)
+
+
+class TestConfigureLogger(unittest.TestCase):
+    """Replacing the process-wide logger"""
+
+    def setUp(self):
+        self.addCleanup(setattr, query_logger, '_logger', query_logger._logger)
+
+    def test_old_logger_closed_and_unregistered(self):
+        """The replaced logger is closed and not closed again at exit"""
+        with patch('query_logger.atexit') as atexit:
+            old = query_logger.configure_logger(stream=io.StringIO())
+            new = query_logger.configure_logger(stream=io.StringIO())
+        self.addCleanup(new.close)
+        atexit.unregister.assert_called_once_with(old.close)
+        self.assertFalse(old._thread.is_alive())
+        self.assertIs(query_logger.get_logger(), new)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Unit tests for retry_policy.py
+
+Covers:
+- the default classifier and retry_on()
+- retry() and async_retry(): retrying transient errors, failing fast on
+  the rest, max_attempts, max_elapsed and the retry budget
+"""
+
+import asyncio
+import sqlite3
+import unittest
+from unittest.mock import patch
+from retry_policy import (RetryBudget, RetryPolicy, async_retry, is_transient,
+                          retry, retry_on)
+
+
+def failing(errors, result='ok'):
+    """A function raising each of errors in turn, then returning result"""
+    errors = list(errors)
+    calls = []
+
+    def func():
+        calls.append(1)
+        if errors:
+            raise errors.pop(0)
+        return result
+    func.calls = calls
+    return func
+
+
+def locked():
+    return sqlite3.OperationalError('database is locked')
+
+
+class TestIsTransient(unittest.TestCase):
+    """The default classifier only retries lock/busy style errors"""
+
+    def test_lock_and_busy_errors(self):
+        """database is locked / busy / table locked are transient"""
+        for message in ('database is locked', 'database table is locked',
+                        'Database is busy', 'disk I/O error'):
+            with self.subTest(message=message):
+                self.assertTrue(is_transient(sqlite3.OperationalError(message)))
+
+    def test_other_operational_errors(self):
+        """Missing tables and syntax errors fail the same way every time"""
+        for message in ('no such table: users', 'near "SELEC": syntax error'):
+            with self.subTest(message=message):
+                self.assertFalse(is_transient(sqlite3.OperationalError(message)))
+
+    def test_other_exceptions(self):
+        """Anything that isn't an OperationalError is not retried"""
+        self.assertFalse(is_transient(ValueError('database is locked')))
+        self.assertFalse(is_transient(sqlite3.IntegrityError('UNIQUE constraint failed')))
+
+    def test_retry_on(self):
+        """retry_on() matches types, and messages when given"""
+        classifier = retry_on(ConnectionError, TimeoutError)
+        self.assertTrue(classifier(ConnectionResetError()))
+        self.assertFalse(classifier(ValueError()))
+        classifier = retry_on(sqlite3.OperationalError, messages=['Locked'])
+        self.assertTrue(classifier(locked()))
+        self.assertFalse(classifier(sqlite3.OperationalError('no such table: users')))
+
+
+class TestRetry(unittest.TestCase):
+    """retry() with no real waiting"""
+
+    def setUp(self):
+        self.budget = RetryBudget(capacity=100)
+        patcher = patch('retry_policy.time.sleep')
+        self.sleep = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def policy(self, **kwargs):
+        kwargs.setdefault('base_delay', 0.01)
+        return RetryPolicy(budget=self.budget, **kwargs)
+
+    def test_transient_errors_are_retried(self):
+        """Two lock errors then success: three calls, two waits"""
+        func = failing([locked(), locked()])
+        self.assertEqual(retry(self.policy())(func)(), 'ok')
+        self.assertEqual(len(func.calls), 3)
+        self.assertEqual(self.sleep.call_count, 2)
+
+    def test_permanent_errors_fail_fast(self):
+        """A non-transient error is raised on the first attempt"""
+        func = failing([sqlite3.OperationalError('no such table: users')])
+        with self.assertRaises(sqlite3.OperationalError):
+            retry(self.policy())(func)()
+        self.assertEqual(len(func.calls), 1)
+        self.sleep.assert_not_called()
+
+    def test_max_attempts(self):
+        """The last error is raised once max_attempts is used up"""
+        func = failing([locked()] * 5)
+        with self.assertRaises(sqlite3.OperationalError):
+            retry(self.policy(max_attempts=3))(func)()
+        self.assertEqual(len(func.calls), 3)
+
+    def test_max_elapsed(self):
+        """No retry starts that would end past max_elapsed"""
+        func = failing([locked()])
+        # full jitter at its top end: a 10s wait against a 1s allowance
+        with patch('retry_policy.random.uniform', side_effect=lambda low, high: high):
+            with self.assertRaises(sqlite3.OperationalError):
+                retry(self.policy(base_delay=10, max_elapsed=1))(func)()
+        self.assertEqual(len(func.calls), 1)
+
+    def test_budget(self):
+        """An empty budget stops retries even under max_attempts"""
+        self.budget = RetryBudget(ratio=0, min_per_second=0, capacity=1)
+        func = failing([locked()] * 3)
+        with self.assertRaises(sqlite3.OperationalError):
+            retry(self.policy(max_attempts=5))(func)()
+        self.assertEqual(len(func.calls), 2)
+
+    def test_on_retry(self):
+        """on_retry gets the error, the failed attempt and the delay"""
+        seen = []
+        retry(self.policy(), on_retry=lambda *a: seen.append(a))(failing([locked()]))()
+        self.assertEqual(len(seen), 1)
+        error, attempt, delay = seen[0]
+        self.assertTrue(is_transient(error))
+        self.assertEqual(attempt, 1)
+        self.assertLessEqual(delay, 0.01)
+
+
+class TestAsyncRetry(unittest.TestCase):
+    """async_retry() awaits between attempts instead of blocking"""
+
+    def test_transient_errors_are_retried(self):
+        """The coroutine is retried and the thread never sleeps"""
+        errors = [locked(), locked()]
+
+        async def func():
+            if errors:
+                raise errors.pop(0)
+            return 'ok'
+
+        policy = RetryPolicy(base_delay=0.001, budget=RetryBudget(capacity=100))
+        with patch('retry_policy.time.sleep') as sleep:
+            self.assertEqual(asyncio.run(async_retry(policy)(func)()), 'ok')
+        sleep.assert_not_called()
+        self.assertEqual(errors, [])
+
+    def test_permanent_errors_fail_fast(self):
+        """A non-transient error is raised without retrying"""
+        calls = []
+
+        async def func():
+            calls.append(1)
+            raise ValueError('bad input')
+
+        with self.assertRaises(ValueError):
+            asyncio.run(async_retry(RetryPolicy(budget=RetryBudget()))(func)())
+        self.assertEqual(len(calls), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
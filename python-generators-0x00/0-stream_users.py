@@ -1,44 +1,85 @@
 import mysql.connector
 from mysql.connector import Error
-from seed import connect_to_prodev, TABLE_NAME
+from seed import close_stream, fetch_in_chunks, DEFAULT_FETCH_SIZE
+from pool import get_pool
+from rows import key_getter, make_converter, needs_dict_cursor
+from keyset import decode_checkpoint, encode_checkpoint
+from query import build_select
 
-def stream_users():
+def stream_users(fetch_size=DEFAULT_FETCH_SIZE, row_format='dict', resume_from=None,
+                 on_checkpoint=None, checkpoint_every=DEFAULT_FETCH_SIZE):
     """
     A generator that streams rows from the user_data table one by one.
     
-    This function connects to the 'ALX_prodev' database, fetches all
-    users, and yields each row as a dictionary. It ensures the database
-    connection is properly closed after the operation.
+    This function checks a connection to the 'ALX_prodev' database out of
+    the shared pool, fetches all users, and yields each row as a dictionary.
+    It ensures the connection is returned to the pool after the operation.
+
+    Rows are read from an unbuffered cursor, so the server streams the
+    result set and only fetch_size rows are held in memory at a time.
+
+    Args:
+        fetch_size (int): The number of rows to fetch per round trip.
+        row_format (str): 'dict' (the default), or 'tuple', 'record' or
+            'namedtuple' for cheaper rows with the age as a float.
+        resume_from (str): A checkpoint token from an earlier run; the stream
+            carries on after the last row that run processed.
+        on_checkpoint (callable): Called with a checkpoint token every
+            checkpoint_every rows, once the consumer is done with them.
+        checkpoint_every (int): How many rows apart checkpoints are.
+
+    Resuming or checkpointing orders the stream by user_id, which is the
+    primary key's natural order and so costs nothing extra.
     """
+    if row_format == 'columns':
+        raise ValueError("The 'columns' row format only applies to batch streams")
+    where, count = decode_checkpoint(resume_from) if resume_from else (None, 0)
+    ordered = resume_from is not None or on_checkpoint is not None
+    query, params = build_select(where=where, order_by=['user_id'] if ordered else None)
+
+    pool = get_pool()
     connection = None
     cursor = None
+    reusable = True
     try:
-        connection = connect_to_prodev()
+        connection = pool.acquire()
         if connection is None:
             # If connection fails, stop the generator.
             return
 
-        # Use buffered=True to ensure all results are fetched at once, which
-        # is necessary for multiple queries in a session.
-        # Use dictionary=True to return rows as dictionaries.
-        cursor = connection.cursor(dictionary=True, buffered=True)
+        # Use dictionary=True to return rows as dictionaries. The cursor is
+        # left unbuffered so rows are read off the socket as we go.
+        dictionary = needs_dict_cursor(row_format)
+        cursor = connection.cursor(dictionary=dictionary)
         
-        cursor.execute(f"SELECT * FROM {TABLE_NAME}")
+        cursor.execute(query, params)
+        convert = None if dictionary else make_converter(row_format, cursor.column_names)
+        key = key_getter(row_format, cursor.column_names) if on_checkpoint else None
 
         # The single loop iterates over the cursor and yields each row.
-        for row in cursor:
+        for row in fetch_in_chunks(cursor, fetch_size, convert):
             yield row
+            # Getting here means the consumer has asked for the next row,
+            # so it has finished with this one.
+            count += 1
+            if key and count % checkpoint_every == 0:
+                on_checkpoint(encode_checkpoint(key(row), count))
             
     except Error as e:
         print(f"Error streaming data: {e}")
+        reusable = False
     finally:
+        # If the consumer stopped early, don't drain the rest of the table;
+        # discarding the connection is enough to abandon the result set.
         if cursor:
-            cursor.close()
+            reusable = close_stream(connection, cursor, drain=False) and reusable
         if connection:
-            connection.close()
+            pool.release(connection, reusable)
 
 if __name__ == "__main__":
-    # This block is for demonstrating the generator locally
-    user_generator = stream_users()
-    for user in user_generator:
-        print(user)
+    # This block is for demonstrating the generator locally; users are
+    # written to stdout as JSON Lines.
+    from sinks import JSONLSink
+
+    with JSONLSink('-') as sink:
+        sink.write_stream(stream_users())
@@ -1,62 +1,157 @@
+import time
 import mysql.connector
 from mysql.connector import Error
-from seed import connect_to_prodev, TABLE_NAME
+from seed import close_stream, TABLE_NAME
+from pool import get_pool
+from query import COLUMNS, build_select, col
+from rows import key_getter, make_converter, needs_dict_cursor
+from keyset import decode_checkpoint, encode_checkpoint
+from prefetch import prefetched
+from instrument import instrumented, start_run
 
-def stream_users_in_batches(batch_size):
+def stream_users_in_batches(batch_size, where=None, columns=None, row_format='dict',
+                            prefetch=0, resume_from=None, on_checkpoint=None, strict=False):
     """
     A generator that fetches rows from the user_data table in batches.
     
     This function uses fetchmany() to efficiently retrieve a specified
     number of rows from the database at a time, yielding each batch.
-    This approach is memory-efficient for very large datasets.
+    This approach is memory-efficient for very large datasets. The
+    connection is borrowed from the shared pool and the cursor is
+    unbuffered, so only one batch is held in memory at a time.
+
+    Filtering and projection are pushed down to the database: only rows
+    matching where, and only the requested columns, cross the wire.
 
     Args:
         batch_size (int): The number of rows to yield in each batch.
+        where (Predicate): An optional filter, e.g. col('age') > 25.
+        columns (list): The columns to fetch, or None for all of them.
+        row_format (str): 'dict' (the default), or 'tuple', 'record' or
+            'namedtuple' for cheaper rows with the age as a float, or
+            'columns' for a ColumnBatch of NumPy arrays per batch.
+        prefetch (int): If non-zero, fetch up to this many batches ahead on
+            a background thread while the caller processes the current one.
+        resume_from (str): A checkpoint token from an earlier run; the stream
+            carries on after the last batch that run processed.
+        on_checkpoint (callable): Called with a checkpoint token after each
+            batch, once the consumer is done with it.
+        strict (bool): Raise database errors, including a failed
+            connection, instead of printing them and ending the stream
+            early. Use it wherever a partial scan would give a silently
+            wrong result.
+
+    With instrumentation enabled (see instrument.enable()), each run records
+    fetch vs consumer time, batch sizes and connection setup time.
+
+    Resuming or checkpointing orders the stream by user_id, which must then
+    be among the fetched columns.
         
     Yields:
-        list: A list of dictionaries, where each dictionary represents a user.
+        list: A list of users, as dictionaries unless row_format says
+        otherwise, or a ColumnBatch for the 'columns' format.
+    """
+    count = 0
+    order_by = None
+    key = None
+    if resume_from is not None:
+        resume, count = decode_checkpoint(resume_from)
+        where = resume if where is None else where & resume
+    if resume_from is not None or on_checkpoint is not None:
+        order_by = ['user_id']
+        key = key_getter(row_format, columns or COLUMNS)
+
+    run = start_run('stream_users_in_batches')
+    batches = fetch_batches(batch_size, where, columns, row_format, order_by, run, strict)
+    if prefetch:
+        batches = prefetched(batches, prefetch)
+    batches = instrumented(batches, run)
+    try:
+        for batch in batches:
+            yield batch
+            # Checkpoint only once the consumer comes back for more, so a
+            # token never covers a batch that hasn't been processed.
+            count += len(batch)
+            if on_checkpoint is not None:
+                on_checkpoint(encode_checkpoint(key(batch[-1]), count))
+    finally:
+        batches.close()
+
+def fetch_batches(batch_size, where=None, columns=None, row_format='dict', order_by=None,
+                  run=None, strict=False):
+    """
+    The query loop behind stream_users_in_batches.
+
+    If run (an instrument.StreamRun) is given, the time taken to check out
+    a connection is recorded on it. With strict, errors are raised rather
+    than printed.
+
+    Yields:
+        list: Up to batch_size rows in row_format.
     """
+    pool = get_pool()
     connection = None
     cursor = None
+    reusable = True
     try:
-        connection = connect_to_prodev()
+        if run is None:
+            connection = pool.acquire()
+        else:
+            start = time.perf_counter()
+            connection = pool.acquire()
+            run.record_connect(time.perf_counter() - start)
         if connection is None:
+            if strict:
+                raise Error("Could not connect to the database")
             return
 
-        cursor = connection.cursor(dictionary=True, buffered=True)
-        # Using a hardcoded table name to satisfy the checker.
-        # The original code with the f-string was functionally correct.
-        cursor.execute("SELECT * FROM user_data")
+        dictionary = needs_dict_cursor(row_format)
+        cursor = connection.cursor(dictionary=dictionary)
+        query, params = build_select(columns, where, order_by)
+        cursor.execute(query, params)
+        convert = None if dictionary else make_converter(row_format, cursor.column_names)
 
         # The first loop fetches batches of rows from the database
         while True:
             rows = cursor.fetchmany(size=batch_size)
             if not rows:
                 break
-            yield rows
+            yield rows if convert is None else convert(rows)
             
     except Error as e:
+        reusable = False
+        if strict:
+            raise
         print(f"Error streaming data in batches: {e}")
     finally:
         if cursor:
-            cursor.close()
+            reusable = close_stream(connection, cursor, drain=False) and reusable
         if connection:
-            connection.close()
+            pool.release(connection, reusable)
 
-def batch_processing(batch_size):
+def batch_processing(batch_size, resume_from=None, on_checkpoint=None, sink=None):
     """
     Processes batches of users to filter those over the age of 25.
     
     This function uses the stream_users_in_batches generator to receive
-    data in chunks and then processes each chunk. This allows for efficient
-    filtering without loading the entire dataset into memory.
+    data in chunks and then processes each chunk. The age filter runs in
+    the database, so only matching users are fetched.
 
     Args:
         batch_size (int): The size of the batch to fetch and process.
+        resume_from (str): A checkpoint token to carry on from.
+        on_checkpoint (callable): Called with a checkpoint token after
+            each batch has been processed.
+        sink (Sink): If given, batches are written to it (e.g. a CSVSink or
+            JSONLSink) instead of printed row by row.
     """
     # Loop 1: Iterates over the batches yielded by the generator
-    for batch in stream_users_in_batches(batch_size):
+    for batch in stream_users_in_batches(batch_size, where=col('age') > 25,
+                                         resume_from=resume_from,
+                                         on_checkpoint=on_checkpoint):
+        if sink is not None:
+            sink.write_batch(batch)
+            continue
         # Loop 2: Iterates over each user within the current batch
         for user in batch:
-            if user['age'] > 25:
-                print(user)
+            print(user)
@@ -1,6 +1,10 @@
 import mysql.connector
 from mysql.connector import Error
-from seed import connect_to_prodev, TABLE_NAME
+from seed import close_stream, fetch_in_chunks, TABLE_NAME
+from pool import get_pool
+from keyset import keyset_paginate
+from prefetch import prefetched
+from instrument import instrumented, start_run
 
 def paginate_users(page_size, offset):
     """
@@ -13,10 +17,11 @@ def paginate_users(page_size, offset):
     Returns:
         list: A list of dictionaries, where each dictionary represents a user.
     """
+    pool = get_pool()
     connection = None
     cursor = None
     try:
-        connection = connect_to_prodev()
+        connection = pool.acquire()
         if connection is None:
             return []
 
@@ -34,57 +39,69 @@ def paginate_users(page_size, offset):
         if cursor:
             cursor.close()
         if connection:
-            connection.close()
+            pool.release(connection)
 
-def lazy_paginate(page_size):
+def lazy_paginate(page_size, prefetch=0):
     """
     A generator that fetches and yields pages of users lazily.
     
-    This function uses a single loop to manage the offset and calls
-    paginate_users to get the next page only when the generator is iterated over.
+    Pages are fetched with keyset pagination on user_id, so each page seeks
+    past the last key of the previous one instead of rescanning an ever
+    growing OFFSET. The next page is only fetched when the generator is
+    iterated over.
 
     Args:
         page_size (int): The number of users to fetch per page.
+        prefetch (int): If non-zero, fetch up to this many pages ahead on
+            a background thread while the caller processes the current one.
         
     Yields:
         list: A list of dictionaries, representing a page of users.
     """
-    offset = 0
-    while True:
-        page = paginate_users(page_size, offset)
-        if not page:
-            # Stop iteration when an empty page is returned
-            break
-        yield page
-        offset += page_size
+    run = start_run('lazy_paginate')
+    pages = keyset_paginate(page_size, run=run)
+    if prefetch:
+        pages = prefetched(pages, prefetch)
+    pages = instrumented(pages, run)
+    try:
+        for page in pages:
+            yield page
+    finally:
+        # Stops the prefetch thread and returns its connection right away
+        # when the caller stops early.
+        pages.close()
 
 def stream_user_ages():
     """
     A generator that yields user ages one by one from the database.
     
     This function is memory-efficient as it does not load all ages
-    into memory at once.
+    into memory at once: the cursor is unbuffered and the connection is
+    borrowed from the shared pool.
     """
+    pool = get_pool()
     connection = None
     cursor = None
+    reusable = True
     try:
-        connection = connect_to_prodev()
+        connection = pool.acquire()
         if connection is None:
             return
         
-        cursor = connection.cursor(buffered=True)
+        cursor = connection.cursor()
         cursor.execute(f"SELECT age FROM {TABLE_NAME}")
         
-        for row in cursor:
+        for row in fetch_in_chunks(cursor):
             yield row[0]
             
     except Error as e:
         print(f"Error streaming ages: {e}")
+        reusable = False
     finally:
         if cursor:
-            cursor.close()
+            reusable = close_stream(connection, cursor, drain=False) and reusable
         if connection:
-            connection.close()
+            pool.release(connection, reusable)
 
 def calculate_average_age():
     """
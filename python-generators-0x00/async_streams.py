@@ -0,0 +1,224 @@
+import asyncio
+import weakref
+from concurrent import futures
+from itertools import islice
+from seed import DEFAULT_FETCH_SIZE
+from pool import POOL_MAX_SIZE, get_pool
+
+stream_users = __import__('0-stream_users').stream_users
+stream_users_in_batches = __import__('1-batch_processing').stream_users_in_batches
+lazy_paginate = __import__('2-lazy_paginate').lazy_paginate
+stream_user_ages = __import__('4-stream_ages').stream_user_ages
+
+# mysql.connector blocks, so the generators run on these threads. There is
+# no point in more threads than the connection pool has connections.
+_executor = futures.ThreadPoolExecutor(max_workers=POOL_MAX_SIZE,
+                                       thread_name_prefix='async-stream')
+
+# One semaphore per event loop limiting how many streams run at once.
+_slots = weakref.WeakKeyDictionary()
+
+_DONE = object()
+
+
+class _Failure:
+    """Carries an exception from the producer task over to the consumer."""
+
+    def __init__(self, error):
+        self.error = error
+
+
+def _chunks(iterable, size):
+    """Groups a row-at-a-time generator into lists, one executor hop each."""
+    iterator = iter(iterable)
+    try:
+        while True:
+            chunk = list(islice(iterator, size))
+            if not chunk:
+                return
+            yield chunk
+    finally:
+        close = getattr(iterator, 'close', None)
+        if close is not None:
+            close()
+
+
+def _stream_slots():
+    """
+    Returns the running loop's stream semaphore, sized to the pool.
+
+    A stream holds its connection between next() calls, so if more streams
+    than connections were let onto the executor, the extra ones would sit
+    in pool.acquire() on every thread while the streams holding
+    connections waited for a thread to move on.
+    """
+    loop = asyncio.get_running_loop()
+    slots = _slots.get(loop)
+    if slots is None:
+        slots = _slots[loop] = asyncio.Semaphore(min(get_pool().max_size, POOL_MAX_SIZE))
+    return slots
+
+
+async def _drive(generator, prefetch=0):
+    """
+    Drives a blocking generator from the event loop.
+
+    Each next() runs on the shared executor. With prefetch, a task keeps
+    up to that many items fetched ahead in an asyncio.Queue. When the
+    consumer stops or is cancelled, the producer is cancelled and the
+    generator is closed on the executor once any in-flight next() has
+    finished, so its pooled connection is returned.
+
+    Streams wait in the event loop for a free slot (see _stream_slots())
+    before touching the executor.
+    """
+    loop = asyncio.get_running_loop()
+    in_flight = None
+    producer = None
+    slots = _stream_slots()
+    await slots.acquire()
+
+    async def fetch():
+        nonlocal in_flight
+        in_flight = _executor.submit(next, generator, _DONE)
+        return await asyncio.wrap_future(in_flight)
+
+    async def produce(items):
+        try:
+            while True:
+                item = await fetch()
+                await items.put(item)
+                if item is _DONE:
+                    return
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await items.put(_Failure(e))
+
+    try:
+        if not prefetch:
+            while True:
+                item = await fetch()
+                if item is _DONE:
+                    return
+                yield item
+
+        items = asyncio.Queue(maxsize=prefetch)
+        producer = asyncio.create_task(produce(items))
+        while True:
+            item = await items.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        if producer is not None:
+            producer.cancel()
+            await asyncio.gather(producer, return_exceptions=True)
+        pending = in_flight
+        if pending is not None and pending.cancel():
+            pending = None
+
+        def close():
+            # A generator can't be closed while another thread is inside it.
+            if pending is not None:
+                futures.wait([pending])
+            generator.close()
+
+        try:
+            await loop.run_in_executor(_executor, close)
+        finally:
+            slots.release()
+
+
+async def async_stream_users(fetch_size=DEFAULT_FETCH_SIZE, row_format='dict', prefetch=0):
+    """
+    An async generator that yields users one by one, like stream_users.
+
+    Rows cross over from the worker thread a chunk of fetch_size at a time.
+
+    Args:
+        fetch_size (int): The number of rows to fetch per round trip.
+        row_format (str): The row format, see stream_users().
+        prefetch (int): How many chunks to fetch ahead, or 0 for none.
+    """
+    rows = _chunks(stream_users(fetch_size, row_format), fetch_size)
+    chunks = _drive(rows, prefetch)
+    try:
+        async for chunk in chunks:
+            for row in chunk:
+                yield row
+    finally:
+        await chunks.aclose()
+
+
+async def async_stream_users_in_batches(batch_size, where=None, columns=None,
+                                        row_format='dict', prefetch=0):
+    """
+    An async generator that yields batches of users, like stream_users_in_batches.
+
+    Args:
+        batch_size (int): The number of rows to yield in each batch.
+        where (Predicate): An optional filter, e.g. col('age') > 25.
+        columns (list): The columns to fetch, or None for all of them.
+        row_format (str): The row format, see stream_users_in_batches().
+        prefetch (int): How many batches to fetch ahead, or 0 for none.
+    """
+    batches = _drive(stream_users_in_batches(batch_size, where, columns, row_format), prefetch)
+    try:
+        async for batch in batches:
+            yield batch
+    finally:
+        await batches.aclose()
+
+
+async def async_lazy_paginate(page_size, prefetch=0):
+    """
+    An async generator that yields pages of users, like lazy_paginate.
+
+    Args:
+        page_size (int): The number of users to fetch per page.
+        prefetch (int): How many pages to fetch ahead, or 0 for none.
+    """
+    pages = _drive(lazy_paginate(page_size), prefetch)
+    try:
+        async for page in pages:
+            yield page
+    finally:
+        await pages.aclose()
+
+
+async def async_stream_user_ages(fetch_size=DEFAULT_FETCH_SIZE, prefetch=0):
+    """
+    An async generator that yields user ages one by one, like stream_user_ages.
+
+    Args:
+        fetch_size (int): How many ages cross over from the worker thread at once.
+        prefetch (int): How many chunks to fetch ahead, or 0 for none.
+    """
+    chunks = _drive(_chunks(stream_user_ages(), fetch_size), prefetch)
+    try:
+        async for chunk in chunks:
+            for age in chunk:
+                yield age
+    finally:
+        await chunks.aclose()
+
+
+if __name__ == "__main__":
+    async def main():
+        # Several streams share one event loop.
+        async def count(stream):
+            total = 0
+            async for batch in stream:
+                total += len(batch)
+            return total
+
+        totals = await asyncio.gather(
+            count(async_stream_users_in_batches(500, prefetch=2)),
+            count(async_lazy_paginate(500, prefetch=2)),
+        )
+        print(f"Rows streamed: {totals}")
+
+    asyncio.run(main())
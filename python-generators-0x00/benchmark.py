@@ -0,0 +1,301 @@
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import resource
+import sqlite3
+import tempfile
+import time
+import uuid
+from queue import Empty
+
+# Each access pattern: (module, function name, positional args, keyword args).
+# Results that are lists (batches, pages) count their length as rows.
+PATTERNS = {
+    'stream_users': ('0-stream_users', 'stream_users', (), {}),
+    'stream_users_tuple': ('0-stream_users', 'stream_users', (), {'row_format': 'tuple'}),
+    'stream_users_in_batches': ('1-batch_processing', 'stream_users_in_batches', (1000,), {}),
+    'stream_users_in_batches_prefetch': ('1-batch_processing', 'stream_users_in_batches',
+                                         (1000,), {'prefetch': 2}),
+    'lazy_paginate': ('2-lazy_paginate', 'lazy_paginate', (1000,), {}),
+    'stream_user_ages': ('4-stream_ages', 'stream_user_ages', (), {}),
+}
+
+
+def synthetic_rows(count, seed=0):
+    """Yields count reproducible (user_id, name, email, age) rows."""
+    rng = random.Random(seed)
+    for i in range(count):
+        user_id = str(uuid.UUID(int=rng.getrandbits(128), version=4))
+        yield (user_id, f"User {i}", f"user{i}@example.com", round(rng.uniform(18, 100), 2))
+
+
+class _CountingCursor:
+    """Wraps a DB-API cursor and counts the calls that go to the database."""
+
+    def __init__(self, cursor, counters):
+        self._cursor = cursor
+        self._counters = counters
+
+    def execute(self, *args, **kwargs):
+        self._counters['round_trips'] += 1
+        return self._cursor.execute(*args, **kwargs)
+
+    def fetchmany(self, *args, **kwargs):
+        self._counters['round_trips'] += 1
+        return self._cursor.fetchmany(*args, **kwargs)
+
+    def fetchall(self):
+        self._counters['round_trips'] += 1
+        return self._cursor.fetchall()
+
+    def fetchone(self):
+        self._counters['round_trips'] += 1
+        return self._cursor.fetchone()
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class _CountingConnection:
+    """Wraps a connection so every cursor it hands out is counted."""
+
+    def __init__(self, connection, counters):
+        self._connection = connection
+        self._counters = counters
+
+    def cursor(self, *args, **kwargs):
+        return _CountingCursor(self._connection.cursor(*args, **kwargs), self._counters)
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+
+class _SQLiteCursor:
+    """Just enough of a mysql.connector cursor for the generators to run on SQLite."""
+
+    def __init__(self, connection, dictionary=False):
+        self._connection = connection
+        self._cursor = connection._db.cursor()
+        self._dictionary = dictionary
+        self.column_names = ()
+        self.rowcount = -1
+
+    def execute(self, query, params=()):
+        self._cursor.execute(query.replace('%s', '?'), tuple(params or ()))
+        self.rowcount = self._cursor.rowcount
+        description = self._cursor.description or ()
+        self.column_names = tuple(column[0] for column in description)
+        self._connection.unread_result = bool(description)
+
+    def _shape(self, rows):
+        if self._dictionary:
+            return [dict(zip(self.column_names, row)) for row in rows]
+        return rows
+
+    def fetchmany(self, size=1):
+        rows = self._cursor.fetchmany(size)
+        if len(rows) < size:
+            self._connection.unread_result = False
+        return self._shape(rows)
+
+    def fetchall(self):
+        self._connection.unread_result = False
+        return self._shape(self._cursor.fetchall())
+
+    def fetchone(self):
+        rows = self.fetchmany(1)
+        return rows[0] if rows else None
+
+    def __iter__(self):
+        while True:
+            row = self.fetchone()
+            if row is None:
+                return
+            yield row
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """
+    A stand-in for a mysql.connector connection backed by SQLite.
+
+    It lets the benchmark exercise the generators without a MySQL server.
+    SQLite cursors are lazy, like mysql.connector's unbuffered ones.
+    """
+
+    def __init__(self, path):
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self.unread_result = False
+
+    def cursor(self, dictionary=False, **kwargs):
+        return _SQLiteCursor(self, dictionary)
+
+    def consume_results(self):
+        self.unread_result = False
+
+    def commit(self):
+        self._db.commit()
+
+    def rollback(self):
+        self._db.rollback()
+
+    def ping(self, reconnect=False):
+        self._db.execute("SELECT 1")
+
+    def close(self):
+        self._db.close()
+
+
+def populate_sqlite(path, rows):
+    """Creates a SQLite user_data table filled with synthetic rows."""
+    db = sqlite3.connect(path)
+    db.execute("DROP TABLE IF EXISTS user_data")
+    db.execute(
+        "CREATE TABLE user_data (user_id VARCHAR(36) PRIMARY KEY, name TEXT NOT NULL, "
+        "email TEXT NOT NULL, age NUMERIC NOT NULL)"
+    )
+    db.executemany("INSERT INTO user_data VALUES (?, ?, ?, ?)", synthetic_rows(rows))
+    db.commit()
+    db.close()
+
+
+def populate_mysql(rows):
+    """Replaces the contents of the MySQL user_data table with synthetic rows."""
+    from seed import TABLE_NAME, connect_to_prodev, create_table
+
+    connection = connect_to_prodev()
+    create_table(connection)
+    cursor = connection.cursor()
+    cursor.execute(f"TRUNCATE TABLE {TABLE_NAME}")
+    sql = f"INSERT INTO {TABLE_NAME} (user_id, name, email, age) VALUES (%s, %s, %s, %s)"
+    chunk = []
+    for row in synthetic_rows(rows):
+        chunk.append(row)
+        if len(chunk) == 10000:
+            cursor.executemany(sql, chunk)
+            chunk = []
+    if chunk:
+        cursor.executemany(sql, chunk)
+    connection.commit()
+    cursor.close()
+    connection.close()
+
+
+def _run_pattern(name, backend, sqlite_path, results):
+    # Runs in a fresh process so peak RSS belongs to this pattern alone.
+    from pool import configure_pool
+    from seed import connect_to_prodev
+
+    counters = {'round_trips': 0, 'connections': 0}
+    if backend == 'sqlite':
+        def open_connection():
+            return SQLiteConnection(sqlite_path)
+    else:
+        def open_connection():
+            return connect_to_prodev(verbose=False)
+
+    def connect():
+        counters['connections'] += 1
+        connection = open_connection()
+        return _CountingConnection(connection, counters) if connection else None
+
+    configure_pool(connect=connect)
+    module, function, args, kwargs = PATTERNS[name]
+    generator = getattr(__import__(module), function)(*args, **kwargs)
+
+    rows = 0
+    first_row = None
+    start = time.perf_counter()
+    for item in generator:
+        if first_row is None:
+            first_row = time.perf_counter() - start
+        rows += len(item) if isinstance(item, list) else 1
+    elapsed = time.perf_counter() - start
+
+    results.put({
+        'pattern': name,
+        'rows': rows,
+        'seconds': elapsed,
+        'rows_per_sec': rows / elapsed if elapsed else 0.0,
+        'time_to_first_row': first_row,
+        'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        'round_trips': counters['round_trips'],
+        'connections': counters['connections'],
+    })
+
+
+def run_benchmarks(rows, backend='sqlite', patterns=None, populate=False):
+    """
+    Runs each access pattern over a user_data table of the given size.
+
+    Args:
+        rows (int): How many synthetic rows to generate.
+        backend (str): 'sqlite' for a throwaway SQLite file, or 'mysql' for
+            the configured ALX_prodev database.
+        patterns (list): Names from PATTERNS, or None for all of them.
+        populate (bool): For MySQL, whether to replace user_data with
+            synthetic rows first; otherwise the existing table is measured
+            and rows is ignored. SQLite is always populated.
+
+    Returns:
+        dict: The run's parameters and one result per pattern.
+    """
+    patterns = patterns or list(PATTERNS)
+    context = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory() as scratch:
+        sqlite_path = os.path.join(scratch, 'user_data.db')
+        if backend == 'sqlite':
+            populate_sqlite(sqlite_path, rows)
+        elif populate:
+            populate_mysql(rows)
+
+        results = []
+        for name in patterns:
+            queue = context.Queue()
+            process = context.Process(target=_run_pattern, args=(name, backend, sqlite_path, queue))
+            process.start()
+            while True:
+                try:
+                    results.append(queue.get(timeout=1))
+                    break
+                except Empty:
+                    if not process.is_alive():
+                        raise RuntimeError(
+                            f"Benchmark '{name}' died with exit code {process.exitcode}")
+            process.join()
+
+    return {
+        'backend': backend,
+        'rows': rows,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'results': results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the user_data generators.")
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--backend', choices=('sqlite', 'mysql'), default='sqlite')
+    parser.add_argument('--pattern', action='append', choices=list(PATTERNS))
+    parser.add_argument('--populate', action='store_true',
+                        help="replace the MySQL user_data table with --rows synthetic rows "
+                             "(this deletes the existing data)")
+    parser.add_argument('--output', default='benchmark_results.json')
+    options = parser.parse_args()
+
+    report = run_benchmarks(options.rows, options.backend, options.pattern,
+                            populate=options.populate)
+    with open(options.output, 'w') as output:
+        json.dump(report, output, indent=2)
+    for result in report['results']:
+        print(f"{result['pattern']:<34}{result['rows_per_sec']:>12,.0f} rows/s  "
+              f"first row {result['time_to_first_row'] or 0:.4f}s  "
+              f"peak RSS {result['peak_rss_kb'] / 1024:.1f} MB  "
+              f"{result['round_trips']} round trips")
@@ -0,0 +1,82 @@
+try:
+    import numpy as np
+except ImportError:  # Only the 'columns' row format needs NumPy.
+    np = None
+
+
+class ColumnBatch:
+    """
+    A batch of users stored column by column, one NumPy array per column.
+
+    Predicates and aggregates are whole-array operations, so filtering a
+    batch of 100k users is a handful of C loops rather than 100k trips
+    through the interpreter:
+
+        >>> adults = batch.filter(batch['age'] > 25)
+        >>> adults.aggregate('age')['mean']
+
+    Ages are float64 arrays; text columns are NumPy unicode arrays, so
+    np.char functions (startswith, endswith, ...) work on them too.
+    """
+
+    def __init__(self, columns):
+        self._columns = dict(columns)
+
+    @classmethod
+    def from_rows(cls, rows, names):
+        """Transposes a list of row tuples into one array per column."""
+        if np is None:
+            raise ImportError("The 'columns' row format needs NumPy")
+        values = list(zip(*rows)) if rows else [()] * len(names)
+        columns = {}
+        for name, column in zip(names, values):
+            if name == 'age':
+                columns[name] = np.array(column, dtype=np.float64)
+            else:
+                columns[name] = np.array(column, dtype=np.str_)
+        return cls(columns)
+
+    @property
+    def names(self):
+        return list(self._columns)
+
+    def __len__(self):
+        for column in self._columns.values():
+            return len(column)
+        return 0
+
+    def __getitem__(self, key):
+        """batch['age'] returns a column; batch[i] returns row i as a dict."""
+        if isinstance(key, str):
+            return self._columns[key]
+        return {name: column[key].item() for name, column in self._columns.items()}
+
+    def __repr__(self):
+        return f"ColumnBatch({len(self)} rows, columns={self.names})"
+
+    def filter(self, mask):
+        """Returns the rows where the boolean array mask is True."""
+        return ColumnBatch({name: column[mask] for name, column in self._columns.items()})
+
+    def aggregate(self, name):
+        """
+        Summarizes a numeric column.
+
+        Returns:
+            dict: count, sum, mean, min and max; the last three are None
+            for an empty batch.
+        """
+        column = self._columns[name]
+        if not len(column):
+            return {'count': 0, 'sum': 0.0, 'mean': None, 'min': None, 'max': None}
+        return {
+            'count': len(column),
+            'sum': float(column.sum()),
+            'mean': float(column.mean()),
+            'min': float(column.min()),
+            'max': float(column.max()),
+        }
+
+    def to_rows(self):
+        """Converts back to a list of row tuples, e.g. for printing."""
+        return list(zip(*(column.tolist() for column in self._columns.values())))
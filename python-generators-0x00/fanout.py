@@ -0,0 +1,129 @@
+import queue
+import threading
+
+# Put on a consumer's queue once the scan is over.
+_DONE = object()
+
+
+class _Branch:
+    """One threaded consumer: its queue, thread and outcome."""
+
+    def __init__(self, consumer, buffer):
+        self.consumer = consumer
+        self.queue = queue.Queue(maxsize=buffer)
+        self.finished = threading.Event()
+        self.result = None
+        self.error = None
+        self.thread = threading.Thread(target=self._run, name='fanout', daemon=True)
+
+    def _batches(self):
+        while True:
+            batch = self.queue.get()
+            if batch is _DONE:
+                return
+            yield batch
+
+    def _run(self):
+        try:
+            self.result = self.consumer(self._batches())
+        except Exception as e:
+            self.error = e
+        finally:
+            # From here on nobody reads the queue, so the scan must stop
+            # feeding it or it would block forever.
+            self.finished.set()
+
+    def put(self, item):
+        while not self.finished.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+
+class FanOut:
+    """
+    Feeds one streaming scan to several consumers.
+
+    Instead of scanning user_data once per job, register every job and run
+    the scan once:
+
+        >>> fan = FanOut(stream_users_in_batches(1000))
+        >>> fan.add(count_users)                  # on its own thread
+        >>> fan.add_inline(statistics.update_batch)
+        >>> results = fan.run()
+
+    Threaded consumers take an iterator of batches and return a result,
+    like the consumers of partitioned_scan. Each has a queue of at most
+    buffer batches; when a slow consumer's queue is full, the scan waits
+    for it, so memory stays bounded. Inline callbacks are called with each
+    batch on the scanning thread. Batches are shared between consumers and
+    must not be modified.
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self._consumers = []
+
+    def add(self, consumer, buffer=4):
+        """Registers a consumer to run on its own thread."""
+        self._consumers.append(_Branch(consumer, buffer))
+        return self
+
+    def add_inline(self, callback):
+        """Registers a callback to run on the scanning thread."""
+        self._consumers.append(callback)
+        return self
+
+    def run(self):
+        """
+        Runs the scan to the end, feeding every consumer.
+
+        Returns:
+            list: Each consumer's result, in the order they were added;
+            None for inline callbacks.
+
+        Raises:
+            Exception: The first error raised by a consumer, once the scan
+            and every other consumer have finished.
+        """
+        branches = [c for c in self._consumers if isinstance(c, _Branch)]
+        callbacks = [c for c in self._consumers if not isinstance(c, _Branch)]
+        for branch in branches:
+            branch.thread.start()
+        try:
+            for batch in self.source:
+                for callback in callbacks:
+                    callback(batch)
+                for branch in branches:
+                    branch.put(batch)
+        finally:
+            close = getattr(self.source, 'close', None)
+            if close is not None:
+                close()
+            for branch in branches:
+                branch.put(_DONE)
+                branch.thread.join()
+
+        for branch in branches:
+            if branch.error is not None:
+                raise branch.error
+        return [c.result if isinstance(c, _Branch) else None for c in self._consumers]
+
+
+if __name__ == "__main__":
+    from stats import StreamStatistics
+
+    stream_users_in_batches = __import__('1-batch_processing').stream_users_in_batches
+
+    def count_over_25(batches):
+        return sum(1 for batch in batches for user in batch if user[3] > 25)
+
+    statistics = StreamStatistics(low=0, high=120, bins=24)
+    fan = FanOut(stream_users_in_batches(1000, row_format='tuple'))
+    fan.add(count_over_25)
+    fan.add_inline(lambda batch: statistics.update_batch([user[3] for user in batch]))
+    over_25, _ = fan.run()
+    print(f"Average age of users: {statistics.summary()['mean']}")
+    print(f"Users over 25: {over_25}")
@@ -0,0 +1,195 @@
+import os
+import sys
+import threading
+import time
+from columnar import ColumnBatch
+
+# Instrumentation is off unless STREAM_METRICS is set or enable() is called.
+# While it is off, start_run() returns None and instrumented() hands the
+# source back untouched, so the generators pay nothing for it.
+_enabled = bool(os.environ.get('STREAM_METRICS'))
+_report = None
+
+COUNTERS = ('runs', 'batches', 'rows', 'bytes', 'fetch_seconds',
+            'consume_seconds', 'connect_seconds')
+# Pool stats that only ever go up; the rest (size, idle, ...) are gauges.
+POOL_COUNTERS = ('checkouts', 'created', 'discarded', 'reaped', 'failed_health_checks',
+                 'timeouts', 'wait_time_total', 'connect_time_total')
+
+
+def _zero_counters():
+    return {key: 0.0 if key.endswith('_seconds') else 0 for key in COUNTERS}
+
+
+def enable(report=None):
+    """
+    Turns instrumentation on for streams started from now on.
+
+    Args:
+        report (callable): Called with each run's summary dict when the
+            stream closes; by default a one-line summary goes to stderr.
+    """
+    global _enabled, _report
+    _enabled = True
+    _report = report
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+class StreamMetrics:
+    """Counters for one named stream, summed over all of its runs."""
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._counters = _zero_counters()
+
+    def add(self, counters):
+        with self._lock:
+            for key, value in counters.items():
+                self._counters[key] += value
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._counters)
+
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def metrics(name):
+    """Returns the StreamMetrics for name, creating it on first use."""
+    with _registry_lock:
+        if name not in _registry:
+            _registry[name] = StreamMetrics(name)
+        return _registry[name]
+
+
+def snapshot_all():
+    """Returns every stream's counters, keyed by stream name."""
+    with _registry_lock:
+        streams = list(_registry.values())
+    return {stream.name: stream.snapshot() for stream in streams}
+
+
+def render_metrics():
+    """
+    Renders the stream counters and pool stats in the Prometheus text
+    format, for a /metrics endpoint or a textfile collector.
+    """
+    from pool import get_pool
+
+    lines = []
+    streams = snapshot_all()
+    for counter in COUNTERS:
+        metric = f"user_stream_{counter}_total"
+        lines.append(f"# TYPE {metric} counter")
+        for name, counters in sorted(streams.items()):
+            lines.append(f'{metric}{{stream="{name}"}} {counters[counter]}')
+    for key, value in sorted(get_pool().stats().items()):
+        kind = 'counter' if key in POOL_COUNTERS else 'gauge'
+        lines.append(f"# TYPE user_pool_{key} {kind}")
+        lines.append(f"user_pool_{key} {value}")
+    return '\n'.join(lines) + '\n'
+
+
+def estimate_bytes(batch):
+    """Roughly how many bytes of row data a batch holds."""
+    if isinstance(batch, ColumnBatch):
+        return sum(batch[name].nbytes for name in batch.names)
+    total = 0
+    for row in batch:
+        values = row.values() if isinstance(row, dict) else row
+        for value in values:
+            total += len(value) if isinstance(value, (str, bytes)) else 8
+    return total
+
+
+class StreamRun:
+    """One run of an instrumented stream; see start_run()."""
+
+    def __init__(self, name):
+        self.name = name
+        self.started = time.perf_counter()
+        self.counters = _zero_counters()
+        self.counters['runs'] = 1
+
+    def record_connect(self, seconds):
+        self.counters['connect_seconds'] += seconds
+
+    def summary(self):
+        summary = dict(self.counters, stream=self.name,
+                       seconds=time.perf_counter() - self.started)
+        del summary['runs']
+        batches = summary['batches']
+        summary['rows_per_batch'] = summary['rows'] / batches if batches else 0.0
+        summary['bytes_per_batch'] = summary['bytes'] / batches if batches else 0.0
+        return summary
+
+
+def start_run(name):
+    """Returns a StreamRun to record into, or None while disabled."""
+    return StreamRun(name) if _enabled else None
+
+
+def _print_summary(summary):
+    busy = summary['fetch_seconds'] + summary['consume_seconds']
+    share = summary['fetch_seconds'] / busy if busy else 0.0
+    print(f"[{summary['stream']}] {summary['batches']} batches, {summary['rows']} rows, "
+          f"{summary['bytes'] / 1e6:.1f} MB in {summary['seconds']:.3f}s: "
+          f"fetch {summary['fetch_seconds']:.3f}s ({share:.0%}), "
+          f"consumer {summary['consume_seconds']:.3f}s, "
+          f"connect {summary['connect_seconds']:.3f}s", file=sys.stderr)
+
+
+def instrumented(source, run):
+    """
+    Wraps a generator of batches so each run measures where its time goes.
+
+    Time blocked inside the source (waiting on MySQL, or on the prefetch
+    queue) counts as fetch time; time between handing out a batch and being
+    asked for the next counts as consumer time. When the stream closes, the
+    run is added to the named StreamMetrics and its summary reported.
+
+    Args:
+        source (iterable): Batches, e.g. from fetch_batches().
+        run (StreamRun): From start_run(); None returns source as it is.
+    """
+    if run is None:
+        return source
+    return _instrumented(source, run)
+
+
+def _instrumented(source, run):
+    counters = run.counters
+    iterator = iter(source)
+    clock = time.perf_counter
+    try:
+        while True:
+            fetch_start = clock()
+            try:
+                batch = next(iterator)
+            except StopIteration:
+                counters['fetch_seconds'] += clock() - fetch_start
+                return
+            counters['fetch_seconds'] += clock() - fetch_start
+            counters['batches'] += 1
+            counters['rows'] += len(batch)
+            counters['bytes'] += estimate_bytes(batch)
+            handed_out = clock()
+            yield batch
+            counters['consume_seconds'] += clock() - handed_out
+    finally:
+        close = getattr(iterator, 'close', None)
+        if close is not None:
+            close()
+        metrics(run.name).add(counters)
+        (_report or _print_summary)(run.summary())
@@ -0,0 +1,152 @@
+import base64
+import json
+import time
+from mysql.connector import Error
+from seed import TABLE_NAME
+from pool import get_pool
+from query import col
+
+# Columns pages can be ordered by. user_id is the primary key; any other
+# column needs an index of its own for the seek to stay cheap. Ties are
+# broken on user_id so the order is always total.
+SORT_KEYS = ('user_id', 'name', 'email', 'age')
+
+def _pack(payload):
+    return base64.urlsafe_b64encode(json.dumps(payload, default=str).encode()).decode()
+
+def _unpack(token, *fields):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token.encode()))
+        return tuple(payload[field] for field in fields)
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"Invalid continuation token: {token!r}") from e
+
+def encode_token(sort_key, row):
+    """
+    Builds the continuation token for the page that follows row.
+
+    The token is opaque to callers: it records the sort key and the last
+    values seen so the next query can seek straight past them.
+    """
+    values = [row[sort_key]] if sort_key == 'user_id' else [row[sort_key], row['user_id']]
+    return _pack({'key': sort_key, 'after': values})
+
+def decode_token(token):
+    """
+    Unpacks a token made by encode_token.
+
+    Returns:
+        tuple: The sort key and the list of values to seek past.
+    """
+    return _unpack(token, 'key', 'after')
+
+def encode_checkpoint(user_id, count):
+    """
+    Builds a checkpoint token for a resumable stream.
+
+    Args:
+        user_id (str): The last user_id the consumer has processed.
+        count (int): How many rows have been processed in total.
+    """
+    return _pack({'after': user_id, 'count': count})
+
+def decode_checkpoint(token):
+    """
+    Unpacks a token made by encode_checkpoint.
+
+    Returns:
+        tuple: A Predicate selecting the rows still to be streamed, and the
+        number of rows processed before the checkpoint.
+    """
+    after, count = _unpack(token, 'after', 'count')
+    return col('user_id') > after, count
+
+def paginate_users_after(page_size, token=None, sort_key='user_id', run=None):
+    """
+    Fetches the page of users that follows a continuation token.
+
+    Unlike LIMIT/OFFSET, the query seeks on the sort key's index, so a page
+    deep into the table costs the same as the first one, and rows inserted
+    or deleted between calls can't shift the page boundaries.
+
+    Args:
+        page_size (int): The number of users to fetch per page.
+        token (str): The token returned with the previous page, or None
+            to start from the beginning.
+        sort_key (str): The column to order and seek on.
+        run (StreamRun): If given, the connection checkout time is
+            recorded on it, see instrument.start_run().
+
+    Returns:
+        tuple: The list of user dictionaries and the token for the next
+        page, which is None once the table is exhausted.
+    """
+    if sort_key not in SORT_KEYS:
+        raise ValueError(f"Cannot paginate on column: {sort_key}")
+
+    params = []
+    where = ""
+    if token is not None:
+        token_key, after = decode_token(token)
+        if token_key != sort_key:
+            raise ValueError(f"Token was issued for sort key '{token_key}', not '{sort_key}'")
+        if sort_key == 'user_id':
+            where = "WHERE user_id > %s"
+            params = after
+        else:
+            where = f"WHERE ({sort_key} > %s OR ({sort_key} = %s AND user_id > %s))"
+            params = [after[0], after[0], after[1]]
+
+    order_by = 'user_id' if sort_key == 'user_id' else f"{sort_key}, user_id"
+    query = f"SELECT * FROM {TABLE_NAME} {where} ORDER BY {order_by} LIMIT %s"
+
+    pool = get_pool()
+    connection = None
+    cursor = None
+    try:
+        if run is None:
+            connection = pool.acquire()
+        else:
+            start = time.perf_counter()
+            connection = pool.acquire()
+            run.record_connect(time.perf_counter() - start)
+        if connection is None:
+            return [], None
+
+        cursor = connection.cursor(dictionary=True)
+        cursor.execute(query, (*params, page_size))
+        rows = cursor.fetchall()
+
+    except Error as e:
+        print(f"Error fetching page: {e}")
+        return [], None
+    finally:
+        if cursor:
+            cursor.close()
+        if connection:
+            pool.release(connection)
+
+    # A short page means there is nothing left to seek to.
+    if len(rows) < page_size:
+        return rows, None
+    return rows, encode_token(sort_key, rows[-1])
+
+def keyset_paginate(page_size, sort_key='user_id', token=None, run=None):
+    """
+    A generator that yields pages of users using keyset pagination.
+
+    Args:
+        page_size (int): The number of users to fetch per page.
+        sort_key (str): The column to order and seek on.
+        token (str): A token to resume from, or None to start at the top.
+        run (StreamRun): Passed on to paginate_users_after().
+
+    Yields:
+        list: A list of dictionaries, representing a page of users.
+    """
+    while True:
+        page, token = paginate_users_after(page_size, token, sort_key, run)
+        if page:
+            yield page
+        if token is None:
+            break
@@ -0,0 +1,130 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import reduce
+from pool import configure_pool, pool_config
+from query import Predicate, col
+from stats import StreamStatistics
+
+stream_users_in_batches = __import__('1-batch_processing').stream_users_in_batches
+
+# user_id is a lowercase UUID string, so its leading hex digits spread
+# evenly over this many values; range partitions are cut on them.
+_PREFIX_DIGITS = 4
+_PREFIX_SPACE = 16 ** _PREFIX_DIGITS
+
+
+def partition_predicates(partitions, strategy='range'):
+    """
+    Splits user_data into disjoint predicates that together cover every row.
+
+    'range' cuts the user_id key space by its hex prefix, so each partition
+    is an index range scan on the primary key. 'hash' assigns rows by
+    CRC32(user_id) instead; it balances any kind of key but every worker
+    has to read the whole index.
+
+    Returns:
+        list: One Predicate per partition.
+    """
+    if partitions < 1:
+        raise ValueError("Need at least one partition")
+    if strategy == 'hash':
+        return [Predicate("MOD(CRC32(user_id), %s) = %s", (partitions, i))
+                for i in range(partitions)]
+    if strategy != 'range':
+        raise ValueError(f"Unknown partition strategy: {strategy}")
+
+    bounds = [f"{i * _PREFIX_SPACE // partitions:0{_PREFIX_DIGITS}x}"
+              for i in range(1, partitions)]
+    predicates = []
+    for i in range(partitions):
+        lower = bounds[i - 1] if i > 0 else None
+        upper = bounds[i] if i < partitions - 1 else None
+        if lower is None and upper is None:
+            predicates.append(Predicate("1 = 1"))
+        elif lower is None:
+            predicates.append(col('user_id') < upper)
+        elif upper is None:
+            predicates.append(col('user_id') >= lower)
+        else:
+            predicates.append((col('user_id') >= lower) & (col('user_id') < upper))
+    return predicates
+
+
+def _init_worker(config):
+    # A worker builds its own pool, set up like the parent's.
+    if config:
+        configure_pool(**config)
+
+
+def _scan_partition(consumer, predicate, batch_size, columns, row_format):
+    # Runs in a worker process. The scan is strict: a partition that fails
+    # must fail the whole job rather than contribute an empty partial.
+    return consumer(stream_users_in_batches(batch_size, predicate, columns, row_format,
+                                            strict=True))
+
+
+def partitioned_scan(consumer, reducer, partitions=None, strategy='range',
+                     where=None, columns=None, batch_size=1000,
+                     row_format='tuple', processes=None):
+    """
+    Scans user_data in parallel, one key range per worker process.
+
+    Each worker streams its partition through stream_users_in_batches and
+    hands the batches to consumer, which returns a partial result. The
+    partial results are then folded together with reducer. Both must be
+    picklable, i.e. defined at module level.
+
+    Workers set up their connection pool with the same configure_pool()
+    arguments as this process. A database error in any partition is
+    raised here instead of yielding a partial result.
+
+    Args:
+        consumer (callable): Takes an iterator of batches, returns a result.
+        reducer (callable): Combines two results into one.
+        partitions (int): How many ranges to split the table into;
+            defaults to the number of CPUs.
+        strategy (str): 'range' or 'hash', see partition_predicates().
+        where (Predicate): An extra filter applied in every partition.
+        columns (list): The columns to fetch, or None for all of them.
+        batch_size (int): Rows per batch handed to the consumer.
+        row_format (str): The row format, see stream_users_in_batches().
+        processes (int): Worker processes; defaults to partitions.
+
+    Returns:
+        The result of reducing every partition's result.
+
+    Raises:
+        mysql.connector.Error: If any partition's scan failed.
+    """
+    partitions = partitions or os.cpu_count() or 1
+    predicates = partition_predicates(partitions, strategy)
+    if where is not None:
+        predicates = [where & predicate for predicate in predicates]
+
+    with ProcessPoolExecutor(max_workers=processes or partitions, initializer=_init_worker,
+                             initargs=(pool_config(),)) as executor:
+        futures = [
+            executor.submit(_scan_partition, consumer, predicate,
+                            batch_size, columns, row_format)
+            for predicate in predicates
+        ]
+        results = [future.result() for future in futures]
+    return reduce(reducer, results)
+
+
+def summarize_ages(batches):
+    """A consumer that folds ages into a StreamStatistics; scan with columns=['age']."""
+    statistics = StreamStatistics(low=0, high=120, bins=24)
+    for batch in batches:
+        statistics.update_batch([row[0] for row in batch])
+    return statistics
+
+
+def merge_statistics(left, right):
+    """A reducer for StreamStatistics partials."""
+    return left.merge(right)
+
+
+if __name__ == "__main__":
+    summary = partitioned_scan(summarize_ages, merge_statistics, columns=['age'])
+    print(summary.summary())
@@ -0,0 +1,261 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from mysql.connector import Error
+from seed import connect_to_prodev
+
+# --- Configuration ---
+POOL_MAX_SIZE = 8
+# Idle connections older than this (seconds) are closed instead of reused.
+POOL_IDLE_TIMEOUT = 300
+# Connections idle for longer than this are pinged before being handed out.
+POOL_HEALTH_CHECK_AFTER = 30
+# How long acquire() waits for a free connection before giving up.
+POOL_CHECKOUT_TIMEOUT = 30
+
+
+class PoolTimeout(Exception):
+    """
+    Raised when no connection became free within the checkout timeout.
+
+    Deliberately not a mysql.connector Error: the generators catch and
+    print those, and a busy pool must not pass for an empty table.
+    """
+
+
+class ConnectionPool:
+    """
+    A thread-safe pool of connections to the ALX_prodev database.
+
+    Connections are opened lazily up to max_size and handed back out on a
+    last-in, first-out basis so the warmest ones get reused. Connections that
+    have sat idle for a while are pinged before use, and ones idle for longer
+    than idle_timeout are closed. Expiry is checked on acquire() and
+    release() only; there is no timer, so a pool nobody touches keeps its
+    idle connections open until close_all().
+    """
+
+    def __init__(self, connect=None, max_size=POOL_MAX_SIZE,
+                 idle_timeout=POOL_IDLE_TIMEOUT,
+                 health_check_after=POOL_HEALTH_CHECK_AFTER,
+                 checkout_timeout=POOL_CHECKOUT_TIMEOUT):
+        self._connect = connect or (lambda: connect_to_prodev(verbose=False))
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.health_check_after = health_check_after
+        self.checkout_timeout = checkout_timeout
+        self._idle = []  # (connection, time it was returned)
+        self._size = 0   # open connections, idle or checked out
+        self._closed = False
+        self._cond = threading.Condition()
+        self._stats = {
+            'checkouts': 0,
+            'created': 0,
+            'discarded': 0,
+            'reaped': 0,
+            'failed_health_checks': 0,
+            'timeouts': 0,
+            'wait_time_total': 0.0,
+            'wait_time_max': 0.0,
+            'connect_time_total': 0.0,
+        }
+
+    def acquire(self, timeout=None):
+        """
+        Checks a connection out of the pool.
+
+        Returns:
+            The connection, or None if a new one could not be opened.
+
+        Raises:
+            PoolTimeout: If the pool stayed full for the whole timeout.
+        """
+        timeout = self.checkout_timeout if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout
+        stale = []
+        with self._cond:
+            while True:
+                stale.extend(self._reap_idle())
+                if self._idle:
+                    connection, idle_since = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    connection, idle_since = None, None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    raise PoolTimeout(f"No connection available after {timeout}s")
+                self._cond.wait(remaining)
+            self._record_wait(time.monotonic() - start)
+        for old in stale:
+            self._close(old)
+
+        if connection is not None and not self._is_healthy(connection, idle_since):
+            self._close(connection)
+            connection = None
+        if connection is None:
+            connect_start = time.monotonic()
+            connection = self._connect()
+            with self._cond:
+                if connection is None:
+                    self._size -= 1
+                    self._cond.notify()
+                    return None
+                self._stats['created'] += 1
+                self._stats['connect_time_total'] += time.monotonic() - connect_start
+        return connection
+
+    def release(self, connection, reusable=True):
+        """
+        Returns a connection to the pool.
+
+        Any open transaction is rolled back first so the next user doesn't
+        read from a stale snapshot. Pass reusable=False for a connection left
+        in an unknown state; it is closed rather than pooled.
+        """
+        if reusable:
+            try:
+                connection.rollback()
+            except Error:
+                reusable = False
+        with self._cond:
+            stale = self._reap_idle()
+            if reusable and not self._closed:
+                self._idle.append((connection, time.monotonic()))
+            else:
+                self._size -= 1
+                if not reusable:
+                    self._stats['discarded'] += 1
+                stale.append(connection)
+            self._cond.notify()
+        for old in stale:
+            self._close(old)
+
+    @contextmanager
+    def connection(self):
+        """Checks out a connection for the duration of a with block."""
+        connection = self.acquire()
+        reusable = True
+        try:
+            yield connection
+        except Exception:
+            reusable = False
+            raise
+        finally:
+            if connection is not None:
+                self.release(connection, reusable)
+
+    def close_all(self):
+        """
+        Closes every idle connection and marks the pool closed, so the
+        checked-out ones are closed when they are released rather than
+        pooled again.
+        """
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+        for connection, _ in idle:
+            self._close(connection)
+
+    def stats(self):
+        """Returns a snapshot of the pool counters, including wait times."""
+        with self._cond:
+            stats = dict(self._stats)
+            stats['size'] = self._size
+            stats['idle'] = len(self._idle)
+            stats['in_use'] = self._size - len(self._idle)
+        checkouts = stats['checkouts']
+        stats['wait_time_avg'] = stats['wait_time_total'] / checkouts if checkouts else 0.0
+        return stats
+
+    def _record_wait(self, waited):
+        self._stats['checkouts'] += 1
+        self._stats['wait_time_total'] += waited
+        if waited > self._stats['wait_time_max']:
+            self._stats['wait_time_max'] = waited
+
+    def _reap_idle(self):
+        # Called with the lock held; returns the expired connections so the
+        # caller can close them after letting go of it. The idle list is
+        # ordered oldest first.
+        cutoff = time.monotonic() - self.idle_timeout
+        expired = []
+        while self._idle and self._idle[0][1] < cutoff:
+            connection, _ = self._idle.pop(0)
+            expired.append(connection)
+        self._size -= len(expired)
+        self._stats['reaped'] += len(expired)
+        return expired
+
+    def _is_healthy(self, connection, idle_since):
+        if time.monotonic() - idle_since < self.health_check_after:
+            return True
+        try:
+            connection.ping(reconnect=False)
+            return True
+        except Error:
+            with self._cond:
+                self._stats['failed_health_checks'] += 1
+            return False
+
+    @staticmethod
+    def _close(connection):
+        try:
+            connection.close()
+        except Error:
+            pass
+
+
+_pool = None
+_pool_pid = None
+_pool_config = {}
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """
+    Returns the process-wide connection pool, creating it on first use.
+
+    A child process started with fork gets a fresh pool rather than sharing
+    the parent's sockets.
+    """
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ConnectionPool()
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def configure_pool(**kwargs):
+    """
+    Replaces the process-wide pool with one built from kwargs, e.g. a
+    different max_size or connect factory. Idle connections of the old
+    pool are closed.
+
+    Returns:
+        ConnectionPool: The new pool.
+    """
+    global _pool, _pool_pid, _pool_config
+    with _pool_lock:
+        old, old_pid = _pool, _pool_pid
+        _pool, _pool_pid = ConnectionPool(**kwargs), os.getpid()
+        _pool_config = dict(kwargs)
+        pool = _pool
+    # A pool inherited over fork shares its sockets with the parent.
+    if old is not None and old_pid == os.getpid():
+        old.close_all()
+    return pool
+
+
+def pool_config():
+    """
+    Returns the keyword arguments of the last configure_pool() call, so
+    worker processes can set up their own pool the same way.
+    """
+    with _pool_lock:
+        return dict(_pool_config)
@@ -0,0 +1,73 @@
+import queue
+import threading
+
+# Put on the queue by the producer thread when the source is exhausted.
+_DONE = object()
+
+
+class _Failure:
+    """Carries an exception raised by the source over to the consumer."""
+
+    def __init__(self, error):
+        self.error = error
+
+
+def prefetched(source, depth=2):
+    """
+    A generator that reads ahead of its consumer on a background thread.
+
+    While the consumer works on one item, a thread is already pulling the
+    next ones out of source, so fetch latency and processing time overlap
+    instead of adding up. At most depth items are queued; when the
+    consumer falls behind, the thread blocks, so memory stays bounded.
+
+    Closing this generator early stops the thread, which then closes
+    source, so any connection it holds is released.
+
+    Args:
+        source (iterable): The batches or pages to fetch ahead, e.g. a
+            stream_users_in_batches() generator.
+        depth (int): How many items may be fetched ahead of the consumer.
+    """
+    if depth < 1:
+        raise ValueError("Prefetch depth must be at least 1")
+    items = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def put(item):
+        # Gives up as soon as the consumer has gone away.
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        iterator = iter(source)
+        try:
+            for item in iterator:
+                if not put(item):
+                    return
+            put(_DONE)
+        except Exception as e:
+            put(_Failure(e))
+        finally:
+            close = getattr(iterator, 'close', None)
+            if close is not None:
+                close()
+
+    thread = threading.Thread(target=produce, name='prefetch', daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = items.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
+        thread.join()
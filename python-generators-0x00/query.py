@@ -0,0 +1,115 @@
+from seed import TABLE_NAME
+
+# Columns of user_data that may appear in a query. Column names end up in
+# the SQL text, so anything not listed here is rejected.
+COLUMNS = ('user_id', 'name', 'email', 'age')
+
+
+class Predicate:
+    """
+    A parameterized SQL condition.
+
+    Predicates combine with & (AND), | (OR) and ~ (NOT) into larger ones;
+    values always travel as query parameters, never inside the SQL text.
+    """
+
+    def __init__(self, sql, params=()):
+        self.sql = sql
+        self.params = tuple(params)
+
+    def __and__(self, other):
+        return Predicate(f"({self.sql} AND {other.sql})", self.params + other.params)
+
+    def __or__(self, other):
+        return Predicate(f"({self.sql} OR {other.sql})", self.params + other.params)
+
+    def __invert__(self):
+        return Predicate(f"(NOT {self.sql})", self.params)
+
+    def __repr__(self):
+        return f"Predicate({self.sql!r}, {self.params!r})"
+
+
+class Column:
+    """
+    A user_data column, used to build predicates.
+
+    Example:
+        >>> (col('age') > 25) & col('email').like('%@example.com')
+        Predicate('(age > %s AND email LIKE %s)', (25, '%@example.com'))
+    """
+
+    __hash__ = None
+
+    def __init__(self, name):
+        if name not in COLUMNS:
+            raise ValueError(f"Unknown column: {name}")
+        self.name = name
+
+    def _compare(self, op, value):
+        return Predicate(f"{self.name} {op} %s", (value,))
+
+    def __eq__(self, value):
+        return self._compare('=', value)
+
+    def __ne__(self, value):
+        return self._compare('<>', value)
+
+    def __lt__(self, value):
+        return self._compare('<', value)
+
+    def __le__(self, value):
+        return self._compare('<=', value)
+
+    def __gt__(self, value):
+        return self._compare('>', value)
+
+    def __ge__(self, value):
+        return self._compare('>=', value)
+
+    def between(self, low, high):
+        return Predicate(f"{self.name} BETWEEN %s AND %s", (low, high))
+
+    def isin(self, values):
+        values = tuple(values)
+        if not values:
+            # An empty IN () is a syntax error; nothing can match anyway.
+            return Predicate("1 = 0")
+        placeholders = ", ".join(["%s"] * len(values))
+        return Predicate(f"{self.name} IN ({placeholders})", values)
+
+    def like(self, pattern):
+        return self._compare('LIKE', pattern)
+
+
+col = Column
+
+
+def build_select(columns=None, where=None, order_by=None):
+    """
+    Builds a SELECT over user_data.
+
+    Args:
+        columns (list): Columns to fetch, or None for all of them.
+        where (Predicate): Rows to keep, or None for every row.
+        order_by (list): Columns to sort by, or None for no ORDER BY.
+
+    Returns:
+        tuple: The SQL string and its parameters.
+    """
+    if columns:
+        for name in columns:
+            Column(name)
+        projection = ", ".join(columns)
+    else:
+        projection = "*"
+    sql = f"SELECT {projection} FROM {TABLE_NAME}"
+    params = ()
+    if where is not None:
+        sql += f" WHERE {where.sql}"
+        params = where.params
+    if order_by:
+        for name in order_by:
+            Column(name)
+        sql += " ORDER BY " + ", ".join(order_by)
+    return sql, params
@@ -0,0 +1,134 @@
+from collections import namedtuple
+from functools import lru_cache
+from operator import attrgetter, itemgetter
+from query import COLUMNS
+from columnar import ColumnBatch
+
+# Shapes a user row can be delivered in. 'dict' is what the generators have
+# always returned; the others skip the per-row dict and turn the DECIMAL age
+# into a float. 'columns' turns a whole batch into a ColumnBatch and only
+# applies to the batch streams.
+ROW_FORMATS = ('dict', 'tuple', 'record', 'namedtuple', 'columns')
+
+
+class UserRow:
+    """A compact user record: attribute access without a per-row __dict__."""
+
+    __slots__ = COLUMNS
+
+    def __init__(self, user_id=None, name=None, email=None, age=None):
+        self.user_id = user_id
+        self.name = name
+        self.email = email
+        self.age = age
+
+    def __iter__(self):
+        return (getattr(self, column) for column in self.__slots__)
+
+    def __eq__(self, other):
+        if not isinstance(other, UserRow):
+            return NotImplemented
+        return tuple(self) == tuple(other)
+
+    def __repr__(self):
+        fields = ", ".join(f"{column}={getattr(self, column)!r}" for column in self.__slots__)
+        return f"UserRow({fields})"
+
+
+@lru_cache(maxsize=None)
+def user_tuple_type(columns):
+    """Returns a namedtuple class for the given column names."""
+    return namedtuple('UserTuple', columns)
+
+
+def needs_dict_cursor(row_format):
+    if row_format not in ROW_FORMATS:
+        raise ValueError(f"Unknown row format: {row_format}")
+    return row_format == 'dict'
+
+
+def make_converter(row_format, columns):
+    """
+    Builds a function that turns a list of raw row tuples into row_format.
+
+    Args:
+        row_format (str): One of ROW_FORMATS other than 'dict', which comes
+            straight from a dictionary cursor.
+        columns (tuple): The column names, in the order the cursor returns them.
+
+    Returns:
+        callable: Takes a list of tuples and returns a list of rows.
+    """
+    columns = tuple(columns)
+    if row_format == 'columns':
+        return lambda rows: ColumnBatch.from_rows(rows, columns)
+    age = columns.index('age') if 'age' in columns else None
+
+    if age is None:
+        to_tuple = list
+    elif columns == COLUMNS:
+        # The common SELECT * case gets a converter without any slicing.
+        def to_tuple(rows):
+            return [(user_id, name, email, float(age))
+                    for user_id, name, email, age in rows]
+    else:
+        def to_tuple(rows):
+            return [row[:age] + (float(row[age]),) + row[age + 1:] for row in rows]
+
+    if row_format == 'tuple':
+        return to_tuple
+    if row_format == 'namedtuple':
+        cls = user_tuple_type(columns)
+        new = tuple.__new__  # skips the generated __new__'s argument handling
+        if columns == COLUMNS:
+            return lambda rows: [new(cls, (user_id, name, email, float(age)))
+                                 for user_id, name, email, age in rows]
+        return lambda rows: [new(cls, row) for row in to_tuple(rows)]
+    if row_format == 'record':
+        if columns == COLUMNS:
+            return lambda rows: [UserRow(user_id, name, email, float(age))
+                                 for user_id, name, email, age in rows]
+        return lambda rows: [UserRow(**dict(zip(columns, row))) for row in to_tuple(rows)]
+    raise ValueError(f"No converter for row format: {row_format}")
+
+
+def key_getter(row_format, columns, key='user_id'):
+    """
+    Returns a function that reads the key column out of a row of row_format.
+
+    Raises:
+        ValueError: If the key column isn't among the fetched columns.
+    """
+    if key not in columns:
+        raise ValueError(f"Column '{key}' must be fetched to checkpoint the stream")
+    if row_format in ('dict', 'columns'):
+        # ColumnBatch rows come out of batch[i] as dicts.
+        return itemgetter(key)
+    if row_format == 'record':
+        return attrgetter(key)
+    return itemgetter(tuple(columns).index(key))
+
+
+if __name__ == "__main__":
+    # Compare the cost of building each row format from raw driver tuples.
+    import timeit
+    import tracemalloc
+    import uuid
+    from decimal import Decimal
+
+    count = 100000
+    raw = [(str(uuid.uuid4()), f"User {i}", f"user{i}@example.com", Decimal(f"{i % 80 + 18}.00"))
+           for i in range(count)]
+    builders = {'dict': lambda rows: [dict(zip(COLUMNS, row)) for row in rows]}
+    for row_format in ROW_FORMATS[1:-1]:
+        builders[row_format] = make_converter(row_format, COLUMNS)
+
+    print(f"{'format':<12}{'rows/s':>14}{'bytes/row':>12}")
+    for row_format, build in builders.items():
+        seconds = min(timeit.repeat(lambda: build(raw), number=1, repeat=3))
+        tracemalloc.start()
+        built = build(raw)
+        size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del built
+        print(f"{row_format:<12}{count / seconds:>14,.0f}{size / count:>12.0f}")
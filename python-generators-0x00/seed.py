@@ -1,7 +1,16 @@
 import mysql.connector
 from mysql.connector import Error
 import csv
+import hashlib
+import io
+import mmap
+import os
+import time
 import uuid
+from collections import deque
+from decimal import Decimal, ROUND_HALF_UP
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 
 # --- Configuration ---
 DB_HOST = 'localhost'
@@ -9,6 +18,15 @@ DB_USER = 'your_username'
 DB_PASSWORD = 'your_password'
 DB_NAME = 'ALX_prodev'
 TABLE_NAME = 'user_data'
+# Rows pulled from the server per round trip by the unbuffered streams.
+DEFAULT_FETCH_SIZE = 1000
+# Rows per INSERT statement and INSERT statements per transaction when loading CSVs.
+DEFAULT_CHUNK_SIZE = 5000
+DEFAULT_COMMIT_EVERY = 4
+# How often (in rows) the loader reports progress.
+PROGRESS_EVERY = 100000
+# Bytes of CSV parsed per task by the parallel reader.
+PARALLEL_SPLIT_BYTES = 8 << 20
 
 # --- Prototypes ---
 
@@ -37,7 +55,7 @@ def create_database(connection):
     finally:
         cursor.close()
 
-def connect_to_prodev():
+def connect_to_prodev(verbose=True):
     """Connects to the ALX_prodev database."""
     try:
         connection = mysql.connector.connect(
@@ -46,7 +64,8 @@ def connect_to_prodev():
             password=DB_PASSWORD,
             database=DB_NAME
         )
-        print(f"Successfully connected to database '{DB_NAME}'.")
+        if verbose:
+            print(f"Successfully connected to database '{DB_NAME}'.")
         return connection
     except Error as e:
         print(f"Error connecting to database '{DB_NAME}': {e}")
@@ -69,46 +88,406 @@ def create_table(connection):
     finally:
         cursor.close()
 
-def insert_data(connection, file_path):
-    """Inserts data from a CSV file into the database if it does not exist."""
-    cursor = connection.cursor()
+def read_csv_chunks(file_path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    A generator that parses a user_data CSV file into lists of row tuples.
+
+    Only one chunk is held in memory at a time. Rows that can't be parsed
+    are skipped; the number skipped is returned when the generator finishes.
+
+    Yields:
+        list: Up to chunk_size (user_id, name, email, age) tuples.
+    """
+    skipped = 0
+    chunk = []
+    with open(file_path, mode='r', newline='') as file:
+        csv_reader = csv.reader(file)
+        next(csv_reader, None)  # Skip header row
+        for row in csv_reader:
+            try:
+                chunk.append((row[0], row[1], row[2], float(row[3])))
+            except (IndexError, ValueError):
+                skipped += 1
+                continue
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+    return skipped
+
+def csv_split_points(file_path, split_bytes=PARALLEL_SPLIT_BYTES):
+    """
+    Cuts a CSV file into byte ranges of roughly split_bytes each.
+
+    Every range starts and ends on a line boundary and the header line is
+    left out. Quoted fields must not contain newlines, which holds for the
+    user_data files.
+
+    Returns:
+        list: (start, end) byte offsets.
+    """
+    if os.path.getsize(file_path) == 0:
+        return []
+    ranges = []
+    with open(file_path, 'rb') as file:
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            size = len(mapped)
+            header_end = mapped.find(b'\n')
+            start = size if header_end == -1 else header_end + 1
+            while start < size:
+                target = start + split_bytes
+                newline = mapped.find(b'\n', target) if target < size else -1
+                end = size if newline == -1 else newline + 1
+                ranges.append((start, end))
+                start = end
+    return ranges
+
+def _parse_csv_range(file_path, start, end):
+    # Runs in a worker process of read_csv_chunks_parallel.
+    with open(file_path, 'rb') as file:
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            text = mapped[start:end].decode()
+    rows = []
+    skipped = 0
+    for row in csv.reader(io.StringIO(text, newline='')):
+        try:
+            rows.append((row[0], row[1], row[2], float(row[3])))
+        except (IndexError, ValueError):
+            skipped += 1
+    return rows, skipped
+
+def read_csv_chunks_parallel(file_path, chunk_size=DEFAULT_CHUNK_SIZE, processes=None,
+                             split_bytes=PARALLEL_SPLIT_BYTES):
+    """
+    A parallel version of read_csv_chunks for very large CSV files.
+
+    The file is memory-mapped and cut at line boundaries into ranges that
+    a pool of worker processes parses side by side. Parsed rows come back
+    in file order. Only a couple of ranges per worker are in flight at
+    once, so memory stays bounded however large the file is.
+
+    Yields:
+        list: Up to chunk_size (user_id, name, email, age) tuples.
+    """
+    processes = processes or os.cpu_count() or 1
+    ranges = iter(csv_split_points(file_path, split_bytes))
+    skipped = 0
+    executor = ProcessPoolExecutor(max_workers=processes)
     try:
-        # Check if table is empty to avoid duplicate insertions on re-run
-        cursor.execute(f"SELECT COUNT(*) FROM {TABLE_NAME}")
-        count = cursor.fetchone()[0]
-        if count > 0:
-            print("Data already exists in the table. Skipping insertion.")
-            return
+        pending = deque(
+            executor.submit(_parse_csv_range, file_path, start, end)
+            for start, end in islice(ranges, processes * 2)
+        )
+        while pending:
+            rows, bad = pending.popleft().result()
+            for start, end in islice(ranges, 1):
+                pending.append(executor.submit(_parse_csv_range, file_path, start, end))
+            skipped += bad
+            for i in range(0, len(rows), chunk_size):
+                yield rows[i:i + chunk_size]
+    finally:
+        executor.shutdown(cancel_futures=True)
+    return skipped
+
+def _report_progress(stats, start):
+    elapsed = time.monotonic() - start
+    stats['seconds'] = elapsed
+    stats['rows_per_sec'] = stats['inserted'] / elapsed if elapsed else 0.0
+    print(f"Inserted {stats['inserted']} rows ({stats['rows_per_sec']:.0f} rows/s).")
+
+def load_csv_infile(connection, file_path):
+    """
+    Loads a CSV file with LOAD DATA LOCAL INFILE, letting the server parse it.
+
+    This needs local_infile enabled on the server and allow_local_infile on
+    the connection.
 
-        with open(file_path, mode='r') as file:
-            csv_reader = csv.reader(file)
-            next(csv_reader)  # Skip header row
-            data_to_insert = [
-                (row[0], row[1], row[2], float(row[3])) for row in csv_reader
-            ]
+    Returns:
+        int: The number of rows loaded.
 
-        sql = f"INSERT INTO {TABLE_NAME} (user_id, name, email, age) VALUES (%s, %s, %s, %s)"
-        cursor.executemany(sql, data_to_insert)
+    Raises:
+        Error: If the server or connection doesn't allow local infile.
+    """
+    cursor = connection.cursor()
+    try:
+        cursor.execute(
+            f"LOAD DATA LOCAL INFILE %s INTO TABLE {TABLE_NAME} "
+            "FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' "
+            "LINES TERMINATED BY '\\n' IGNORE 1 LINES "
+            "(user_id, name, email, age)",
+            (file_path,)
+        )
         connection.commit()
-        print(f"Successfully inserted {cursor.rowcount} rows into '{TABLE_NAME}'.")
+        return cursor.rowcount
+    finally:
+        cursor.close()
+
+def load_csv(connection, file_path, chunk_size=DEFAULT_CHUNK_SIZE,
+             commit_every=DEFAULT_COMMIT_EVERY, use_infile=False,
+             progress_every=PROGRESS_EVERY, parallel=False):
+    """
+    Streams a CSV file into the user_data table in chunks.
+
+    Each chunk goes out as one executemany() call, which mysql.connector
+    sends as a single multi-row INSERT, and a transaction is committed every
+    commit_every chunks. Memory use is bounded by the chunk size however
+    large the file is, and a failing statement only rolls back the chunks
+    since the last commit; the load then carries on with the next chunk.
+
+    Args:
+        connection: An open connection to the ALX_prodev database.
+        file_path (str): The CSV file to load.
+        chunk_size (int): Rows per INSERT statement.
+        commit_every (int): INSERT statements per transaction.
+        use_infile (bool): Try LOAD DATA LOCAL INFILE first, falling back to
+            chunked INSERTs if the server or connection doesn't allow it.
+        progress_every (int): Print progress after roughly this many rows.
+        parallel (bool): Parse the file in a process pool with
+            read_csv_chunks_parallel; worth it for multi-GB files.
+
+    Returns:
+        dict: inserted, failed and skipped row counts, seconds and rows_per_sec.
+    """
+    stats = {'inserted': 0, 'failed': 0, 'skipped': 0, 'seconds': 0.0, 'rows_per_sec': 0.0}
+    start = time.monotonic()
+
+    if use_infile:
+        try:
+            stats['inserted'] = load_csv_infile(connection, file_path)
+            _report_progress(stats, start)
+            return stats
+        except Error as e:
+            print(f"LOAD DATA LOCAL INFILE unavailable ({e}); using chunked INSERTs.")
+            connection.rollback()
+
+    sql = f"INSERT INTO {TABLE_NAME} (user_id, name, email, age) VALUES (%s, %s, %s, %s)"
+    cursor = connection.cursor()
+    pending = 0          # rows sent since the last commit
+    pending_chunks = 0
+    last_report = 0
+    read_chunks = read_csv_chunks_parallel if parallel else read_csv_chunks
+    chunks = read_chunks(file_path, chunk_size)
+    try:
+        while True:
+            try:
+                chunk = next(chunks)
+            except StopIteration as done:
+                stats['skipped'] = done.value or 0
+                break
+            try:
+                cursor.executemany(sql, chunk)
+            except Error as e:
+                print(f"Error inserting chunk, rolling back {pending + len(chunk)} rows: {e}")
+                connection.rollback()
+                stats['failed'] += pending + len(chunk)
+                pending = pending_chunks = 0
+            else:
+                pending += len(chunk)
+                pending_chunks += 1
+                if pending_chunks >= commit_every:
+                    # The current chunk is already part of pending here.
+                    try:
+                        connection.commit()
+                        stats['inserted'] += pending
+                    except Error as e:
+                        print(f"Error committing, rolling back {pending} rows: {e}")
+                        connection.rollback()
+                        stats['failed'] += pending
+                    pending = pending_chunks = 0
+            if stats['inserted'] - last_report >= progress_every:
+                last_report = stats['inserted']
+                _report_progress(stats, start)
+        if pending:
+            connection.commit()
+            stats['inserted'] += pending
     except Error as e:
         print(f"Error inserting data: {e}")
         connection.rollback()
+        stats['failed'] += pending
     finally:
         cursor.close()
 
-def stream_data_generator(connection):
+    _report_progress(stats, start)
+    return stats
+
+_CENTS = Decimal('0.01')
+
+def decimal_age(age):
+    """
+    Rounds an age the way MySQL stores it in DECIMAL(5, 2): half up.
+
+    Formatting the float with :.2f would round ties to even (and on the
+    binary value), so 67.125 would come out as 67.12 rather than 67.13.
+    """
+    return Decimal(str(age)).quantize(_CENTS, ROUND_HALF_UP)
+
+def row_hash(row):
+    """
+    Hashes the non-key columns of a (user_id, name, email, age) row.
+
+    The age is rounded and rendered the way MySQL stores DECIMAL(5, 2), so
+    the result matches MD5(CONCAT_WS('\x1f', name, email, age)) computed
+    server-side.
+    """
+    _, name, email, age = row
+    return hashlib.md5(f"{name}\x1f{email}\x1f{decimal_age(age)}".encode()).hexdigest()
+
+def sync_csv(connection, file_path, chunk_size=DEFAULT_CHUNK_SIZE, parallel=False):
+    """
+    Brings the user_data table in line with a CSV file, touching only the delta.
+
+    For each chunk of the file, the stored hashes of the rows with the same
+    primary keys are looked up, and only rows that are new or whose content
+    hash changed are written, with INSERT ... ON DUPLICATE KEY UPDATE. Each
+    chunk is committed on its own. Rows missing from the file are left alone.
+
+    With parallel=True the file is parsed by read_csv_chunks_parallel.
+
+    Returns:
+        dict: inserted, updated, unchanged, failed and skipped row counts.
+    """
+    stats = {'inserted': 0, 'updated': 0, 'unchanged': 0, 'failed': 0, 'skipped': 0}
+    upsert = (
+        f"INSERT INTO {TABLE_NAME} (user_id, name, email, age) VALUES (%s, %s, %s, %s) "
+        "ON DUPLICATE KEY UPDATE name = VALUES(name), email = VALUES(email), age = VALUES(age)"
+    )
+    cursor = connection.cursor()
+    read_chunks = read_csv_chunks_parallel if parallel else read_csv_chunks
+    chunks = read_chunks(file_path, chunk_size)
+    try:
+        while True:
+            try:
+                chunk = next(chunks)
+            except StopIteration as done:
+                stats['skipped'] = done.value or 0
+                break
+            # Later rows in the file win if a key appears twice. Ages are
+            # rounded up front so the hash and the upsert see the same value.
+            rows = {row[0]: (*row[:3], decimal_age(row[3])) for row in chunk}
+            # Counted into stats only once the chunk is committed, so a
+            # failed chunk shows up as failed and nothing else.
+            tally = {'inserted': 0, 'updated': 0, 'unchanged': 0}
+            try:
+                placeholders = ", ".join(["%s"] * len(rows))
+                cursor.execute(
+                    f"SELECT user_id, MD5(CONCAT_WS(%s, name, email, age)) "
+                    f"FROM {TABLE_NAME} WHERE user_id IN ({placeholders})",
+                    ("\x1f", *rows)
+                )
+                stored = dict(cursor.fetchall())
+
+                changed = []
+                for user_id, row in rows.items():
+                    if user_id not in stored:
+                        tally['inserted'] += 1
+                    elif stored[user_id] != row_hash(row):
+                        tally['updated'] += 1
+                    else:
+                        tally['unchanged'] += 1
+                        continue
+                    changed.append(row)
+
+                if changed:
+                    cursor.executemany(upsert, changed)
+                connection.commit()
+            except Error as e:
+                print(f"Error syncing chunk, rolling back {len(rows)} rows: {e}")
+                connection.rollback()
+                stats['failed'] += len(rows)
+            else:
+                for key, count in tally.items():
+                    stats[key] += count
+    finally:
+        cursor.close()
+
+    print(
+        f"Synced '{TABLE_NAME}': {stats['inserted']} inserted, {stats['updated']} updated, "
+        f"{stats['unchanged']} unchanged, {stats['failed']} failed."
+    )
+    return stats
+
+def insert_data(connection, file_path):
+    """
+    Inserts data from a CSV file into the database.
+
+    An empty table is bulk loaded. If the table already has data, it is
+    synced incrementally instead, so only new or changed rows are written.
+    """
+    cursor = connection.cursor()
+    try:
+        cursor.execute(f"SELECT COUNT(*) FROM {TABLE_NAME}")
+        count = cursor.fetchone()[0]
+    except Error as e:
+        print(f"Error inserting data: {e}")
+        return
+    finally:
+        cursor.close()
+
+    if count > 0:
+        print("Data already exists in the table. Syncing changes only.")
+        sync_csv(connection, file_path)
+        return
+
+    stats = load_csv(connection, file_path)
+    print(f"Successfully inserted {stats['inserted']} rows into '{TABLE_NAME}'.")
+
+def fetch_in_chunks(cursor, fetch_size=DEFAULT_FETCH_SIZE, convert=None):
+    """
+    Yields rows from an unbuffered cursor, fetch_size rows at a time.
+
+    At most one chunk is held in client memory, so memory use stays flat
+    however large the result set is. If given, convert is applied to each
+    chunk (a list of rows) before its rows are yielded.
+    """
+    while True:
+        rows = cursor.fetchmany(size=fetch_size)
+        if not rows:
+            return
+        if convert is not None:
+            rows = convert(rows)
+        for row in rows:
+            yield row
+
+def close_stream(connection, cursor, drain=True):
+    """
+    Closes a cursor opened by an unbuffered stream.
+
+    If the consumer stopped iterating early, the rest of the result set is
+    still waiting on the socket and mysql.connector refuses to close the
+    cursor until it has been read. With drain=True the leftover rows are read
+    and discarded so the connection can be used again. With drain=False they
+    are left alone, which avoids pulling the rest of a large table over the
+    wire, but the connection is then unusable and must be closed by the caller.
+
+    Returns:
+        bool: True if the connection can be reused, False otherwise.
+    """
+    try:
+        if connection.unread_result:
+            if not drain:
+                return False
+            connection.consume_results()
+        cursor.close()
+        return True
+    except Error as e:
+        print(f"Error closing stream: {e}")
+        return False
+
+def stream_data_generator(connection, fetch_size=DEFAULT_FETCH_SIZE):
     """A generator that streams rows from the database one by one."""
-    cursor = connection.cursor(dictionary=True, buffered=True)
+    # An unbuffered cursor reads rows off the socket as they are fetched
+    # instead of loading the whole table into memory on execute().
+    cursor = connection.cursor(dictionary=True)
     try:
         print("\nStreaming data from the database...")
         cursor.execute(f"SELECT * FROM {TABLE_NAME}")
-        for row in cursor:
-            yield row
+        yield from fetch_in_chunks(cursor, fetch_size)
     except Error as e:
         print(f"Error streaming data: {e}")
     finally:
-        cursor.close()
+        # The connection belongs to the caller, so leave it usable.
+        close_stream(connection, cursor)
 
 # --- Main execution logic ---
 if __name__ == "__main__":
@@ -135,11 +514,13 @@ if __name__ == "__main__":
         # Step 5: Read and insert data from CSV
         insert_data(prodev_connection, 'user_data.csv')
 
-        # Step 6: Demonstrate the data generator
+        # Step 6: Demonstrate the data generator, writing rows as JSON Lines
+        from sinks import JSONLSink
+
         data_stream = stream_data_generator(prodev_connection)
         print("\n--- Streaming data from generator ---")
-        for user in data_stream:
-            print(user)
+        with JSONLSink('-') as sink:
+            sink.write_stream(data_stream)
 
     except Exception as e:
         print(f"An unexpected error occurred: {e}")
@@ -0,0 +1,160 @@
+import csv
+import gzip
+import io
+import json
+import sys
+import time
+from decimal import Decimal
+from query import COLUMNS
+from columnar import ColumnBatch
+
+# Bytes collected in memory before each write to the file.
+DEFAULT_BUFFER_SIZE = 1 << 20
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class Sink:
+    """
+    Base class for buffered row writers.
+
+    Rows are encoded a batch at a time and written out in large chunks,
+    so an export costs a few big write() calls rather than one per row.
+    A path ending in .gz is gzip-compressed; '-' writes to stdout.
+
+    Rows may be dicts, tuples, namedtuples or UserRows, and whole
+    ColumnBatches are accepted too. Plain tuples are read in the order
+    of columns.
+    """
+
+    def __init__(self, path, columns=COLUMNS, buffer_size=DEFAULT_BUFFER_SIZE):
+        self.path = path
+        self.columns = list(columns)
+        self.buffer_size = buffer_size
+        self.rows = 0
+        self.bytes = 0
+        self._started = time.monotonic()
+        self._pending = []
+        self._pending_size = 0
+        self._stdout = path == '-'
+        if self._stdout:
+            self._file = sys.stdout.buffer
+            self._owns_file = False
+        elif str(path).endswith('.gz'):
+            self._file = gzip.open(path, 'wb')
+            self._owns_file = True
+        else:
+            self._file = open(path, 'wb')
+            self._owns_file = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def _records(self, batch):
+        """Normalizes a batch into a list of value tuples in column order."""
+        if isinstance(batch, ColumnBatch):
+            return [tuple(row) for row in zip(*(batch[name].tolist() for name in self.columns))]
+        records = []
+        for row in batch:
+            if isinstance(row, dict):
+                records.append(tuple(row.get(name) for name in self.columns))
+            elif hasattr(row, '_asdict') or hasattr(row, '__slots__'):
+                records.append(tuple(getattr(row, name) for name in self.columns))
+            else:
+                records.append(tuple(row))
+        return records
+
+    def encode(self, records):
+        """Encodes a list of value tuples into bytes. Implemented by subclasses."""
+        raise NotImplementedError
+
+    def write_batch(self, batch):
+        """Buffers one batch of rows, flushing once the buffer is full."""
+        records = self._records(batch)
+        if not records:
+            return
+        data = self.encode(records)
+        self._pending.append(data)
+        self._pending_size += len(data)
+        self.rows += len(records)
+        if self._pending_size >= self.buffer_size:
+            self.flush()
+
+    def write_stream(self, rows, batch_size=1000):
+        """Writes a row-at-a-time stream such as stream_users() in batches."""
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                self.write_batch(batch)
+                batch = []
+        if batch:
+            self.write_batch(batch)
+
+    def flush(self):
+        if self._stdout:
+            # Rows skip sys.stdout's text buffer, so anything print()ed
+            # before them (e.g. by the generator feeding write_stream())
+            # has to go out first.
+            sys.stdout.flush()
+        if self._pending:
+            self._file.write(b''.join(self._pending))
+            self.bytes += self._pending_size
+            self._pending = []
+            self._pending_size = 0
+        self._file.flush()
+
+    def close(self):
+        self.flush()
+        if self._owns_file:
+            self._file.close()
+
+    def stats(self):
+        """Returns rows and bytes written so far, with throughput."""
+        elapsed = time.monotonic() - self._started
+        return {
+            'rows': self.rows,
+            'bytes': self.bytes,
+            'seconds': elapsed,
+            'bytes_per_sec': self.bytes / elapsed if elapsed else 0.0,
+            'rows_per_sec': self.rows / elapsed if elapsed else 0.0,
+        }
+
+
+class CSVSink(Sink):
+    """Writes rows as CSV, with a header line naming the columns."""
+
+    def __init__(self, path, columns=COLUMNS, buffer_size=DEFAULT_BUFFER_SIZE):
+        super().__init__(path, columns, buffer_size)
+        self._header = True
+
+    def encode(self, records):
+        text = io.StringIO()
+        writer = csv.writer(text)
+        if self._header:
+            writer.writerow(self.columns)
+            self._header = False
+        writer.writerows(records)
+        return text.getvalue().encode()
+
+
+class JSONLSink(Sink):
+    """Writes one JSON object per line (JSON Lines / NDJSON)."""
+
+    def encode(self, records):
+        dumps = json.JSONEncoder(default=_json_default, ensure_ascii=False).encode
+        columns = self.columns
+        lines = [dumps(dict(zip(columns, record))) for record in records]
+        lines.append('')
+        return '\n'.join(lines).encode()
+
+
+NDJSONSink = JSONLSink
@@ -0,0 +1,325 @@
+import hashlib
+import heapq
+import math
+import random
+from array import array
+
+# Sketches hash with BLAKE2b rather than hash(), which is salted per
+# process: partial sketches built by different workers must agree.
+
+
+def _hash64(value):
+    """A stable 64-bit hash of a value's string form."""
+    digest = hashlib.blake2b(str(value).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
+
+
+class ReservoirSample:
+    """
+    A uniform random sample of at most size items from a stream.
+
+    Uses Li's Algorithm L, which works out how many items to skip before
+    the next replacement instead of drawing a random number per item. Two
+    samples of disjoint streams merge into a uniform sample of both.
+    """
+
+    def __init__(self, size=100, seed=None):
+        self.size = size
+        self.count = 0
+        self.items = []
+        self._random = random.Random(seed)
+        self._w = 1.0
+        self._next = size
+
+    def _skip(self):
+        # Index (in stream order) of the next item to put in the sample.
+        gap = math.log(1.0 - self._random.random()) / math.log(1 - self._w)
+        self._next = self.count + int(gap)
+
+    def _replace(self, value):
+        self.items[self._random.randrange(self.size)] = value
+        self._w *= math.exp(math.log(self._random.random()) / self.size)
+        self._skip()
+
+    def update(self, value):
+        self.count += 1
+        if len(self.items) < self.size:
+            self.items.append(value)
+            if len(self.items) == self.size:
+                self._w = math.exp(math.log(self._random.random()) / self.size)
+                self._skip()
+        elif self.count > self._next:
+            self._replace(value)
+
+    def update_batch(self, values):
+        i = 0
+        while i < len(values) and len(self.items) < self.size:
+            self.update(values[i])
+            i += 1
+        # Jump straight to the items that get sampled.
+        start = self.count - i
+        while True:
+            i = self._next - start
+            if i >= len(values):
+                break
+            self.count = start + i + 1
+            self._replace(values[i])
+        self.count = start + len(values)
+
+    def merge(self, other):
+        """Folds in a sample of a disjoint stream."""
+        total = self.count + other.count
+        if not other.count:
+            return self
+        mine = self._random.sample(self.items, len(self.items))
+        theirs = self._random.sample(other.items, len(other.items))
+        left, right = self.count, other.count
+        items = []
+        while len(items) < self.size and (mine or theirs):
+            # Each slot comes from a side in proportion to the items it saw.
+            if theirs and (not mine or self._random.random() * (left + right) >= left):
+                items.append(theirs.pop())
+                right -= 1
+            else:
+                items.append(mine.pop())
+                left -= 1
+        self.items = items
+        self.count = total
+        if len(items) == self.size:
+            # The largest of size uniform keys out of count.
+            self._w = self._random.betavariate(self.size, total - self.size + 1)
+            self._skip()
+        return self
+
+
+# 2 ** -rank for every possible register value.
+_INVERSE_POWERS = [math.ldexp(1.0, -rank) for rank in range(65)]
+
+
+class HyperLogLog:
+    """
+    Estimates how many distinct values a stream holds.
+
+    Memory is 2 ** precision bytes whatever the stream size; the standard
+    error is about 1.04 / sqrt(2 ** precision), 0.8% at the default.
+    Sketches of the same precision merge by taking register maxima.
+    """
+
+    def __init__(self, precision=14):
+        if not 4 <= precision <= 18:
+            raise ValueError("precision must be between 4 and 18")
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def update(self, value):
+        x = _hash64(value)
+        bits = 64 - self.precision
+        index = x >> bits
+        rank = bits - (x & ((1 << bits) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def update_batch(self, values):
+        for value in values:
+            self.update(value)
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLogs of different precision")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def cardinality(self):
+        """The estimated number of distinct values."""
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(_INVERSE_POWERS[r] for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Linear counting is more accurate while many registers are empty.
+            return m * math.log(m / zeros)
+        return estimate
+
+
+class CountMinSketch:
+    """
+    Approximate per-value counts in fixed memory.
+
+    Estimates never undercount; they overcount by at most
+    e / width * total with probability 1 - exp(-depth). Sketches with the
+    same width and depth merge by adding their tables.
+    """
+
+    def __init__(self, width=2048, depth=5):
+        self.width = width
+        self.depth = depth
+        self.total = 0
+        self.table = [array('q', bytes(8 * width)) for _ in range(depth)]
+
+    def _columns(self, value):
+        # Double hashing: row i uses h1 + i * h2.
+        digest = hashlib.blake2b(str(value).encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.width for i in range(self.depth)]
+
+    def update(self, value, count=1):
+        self.total += count
+        for row, column in zip(self.table, self._columns(value)):
+            row[column] += count
+
+    def update_batch(self, values):
+        for value in values:
+            self.update(value)
+
+    def estimate(self, value):
+        return min(row[column] for row, column in zip(self.table, self._columns(value)))
+
+    def merge(self, other):
+        if (other.width, other.depth) != (self.width, self.depth):
+            raise ValueError("Cannot merge CountMinSketches of different shapes")
+        for row, other_row in zip(self.table, other.table):
+            for i, count in enumerate(other_row):
+                if count:
+                    row[i] += count
+        self.total += other.total
+        return self
+
+
+class TopK:
+    """
+    The most frequent values of a stream, by the Space-Saving algorithm.
+
+    Keeps capacity counters. A new value takes over the smallest counter
+    and inherits its count as possible overcount, so any value occurring
+    more than total / capacity times is guaranteed to be tracked. Merging
+    follows Agarwal et al.'s mergeable summaries.
+    """
+
+    def __init__(self, capacity=100):
+        self.capacity = capacity
+        self.total = 0
+        self.counts = {}
+        self.errors = {}
+
+    def update(self, value, count=1):
+        self.total += count
+        if value in self.counts:
+            self.counts[value] += count
+        elif len(self.counts) < self.capacity:
+            self.counts[value] = count
+            self.errors[value] = 0
+        else:
+            smallest = min(self.counts, key=self.counts.get)
+            floor = self.counts.pop(smallest)
+            del self.errors[smallest]
+            self.counts[value] = floor + count
+            self.errors[value] = floor
+
+    def update_batch(self, values):
+        tally = {}
+        for value in values:
+            tally[value] = tally.get(value, 0) + 1
+        for value, count in tally.items():
+            self.update(value, count)
+
+    def _floor(self):
+        # What an untracked value may have occurred, at most.
+        return min(self.counts.values()) if len(self.counts) >= self.capacity else 0
+
+    def merge(self, other):
+        floor, other_floor = self._floor(), other._floor()
+        counts = {}
+        errors = {}
+        for value in self.counts.keys() | other.counts.keys():
+            counts[value] = self.counts.get(value, floor) + other.counts.get(value, other_floor)
+            errors[value] = (self.errors.get(value, floor)
+                             + other.errors.get(value, other_floor))
+        kept = heapq.nlargest(self.capacity, counts, key=counts.get)
+        self.counts = {value: counts[value] for value in kept}
+        self.errors = {value: errors[value] for value in kept}
+        self.total += other.total
+        return self
+
+    def top(self, k=10):
+        """
+        Returns:
+            list: (value, count, error) for the k most frequent values; the
+            true count lies between count - error and count.
+        """
+        values = heapq.nlargest(k, self.counts, key=self.counts.get)
+        return [(value, self.counts[value], self.errors[value]) for value in values]
+
+
+def email_domain(email):
+    return email.rsplit('@', 1)[-1].lower()
+
+
+class UserSketches:
+    """
+    The dashboard's approximate view of user_data, built in one pass.
+
+    Holds a sample of users, distinct counts of users and email domains,
+    and the most common names and domains. Takes batches of
+    (user_id, name, email, age) tuples, so it works as a FanOut inline
+    callback (fan.add_inline(sketches.update_batch)) or through
+    sketch_users/merge_sketches with partitioned_scan.
+    """
+
+    def __init__(self, sample_size=100, precision=14, capacity=100, seed=None):
+        self.sample = ReservoirSample(sample_size, seed)
+        self.distinct_users = HyperLogLog(precision)
+        self.distinct_domains = HyperLogLog(precision)
+        self.names = TopK(capacity)
+        self.domains = TopK(capacity)
+
+    def update_batch(self, batch):
+        domains = [email_domain(row[2]) for row in batch]
+        self.sample.update_batch(batch)
+        self.distinct_users.update_batch([row[0] for row in batch])
+        self.distinct_domains.update_batch(domains)
+        self.names.update_batch([row[1] for row in batch])
+        self.domains.update_batch(domains)
+
+    def merge(self, other):
+        self.sample.merge(other.sample)
+        self.distinct_users.merge(other.distinct_users)
+        self.distinct_domains.merge(other.distinct_domains)
+        self.names.merge(other.names)
+        self.domains.merge(other.domains)
+        return self
+
+    def summary(self, k=10):
+        return {
+            'users': self.sample.count,
+            'distinct_users': round(self.distinct_users.cardinality()),
+            'distinct_domains': round(self.distinct_domains.cardinality()),
+            'top_names': self.names.top(k),
+            'top_domains': self.domains.top(k),
+            'sample': self.sample.items,
+        }
+
+
+def sketch_users(batches):
+    """A partitioned_scan consumer that builds UserSketches from tuple batches."""
+    sketches = UserSketches()
+    for batch in batches:
+        sketches.update_batch(batch)
+    return sketches
+
+
+def merge_sketches(left, right):
+    """A reducer for UserSketches (or any single sketch) partials."""
+    return left.merge(right)
+
+
+if __name__ == "__main__":
+    from partition import partitioned_scan
+
+    summary = partitioned_scan(sketch_users, merge_sketches).summary(k=5)
+    print(f"Users: {summary['users']} ({summary['distinct_users']} distinct ids)")
+    print(f"Distinct email domains: {summary['distinct_domains']}")
+    print(f"Top names: {summary['top_names']}")
+    print(f"Top domains: {summary['top_domains']}")
+    for user in summary['sample'][:5]:
+        print(user)
@@ -0,0 +1,202 @@
+import json
+import mmap
+import os
+import shutil
+import sys
+from array import array
+from stats import StreamStatistics
+
+try:
+    import numpy as np
+except ImportError:  # Columns are exposed as memoryviews instead.
+    np = None
+
+stream_users_in_batches = __import__('1-batch_processing').stream_users_in_batches
+
+SNAPSHOT_VERSION = 1
+# Numeric columns are stored as raw float64; text columns as an int64
+# offsets file plus a UTF-8 blob, so row i spans data[offsets[i]:offsets[i + 1]].
+NUMERIC_COLUMNS = ('age',)
+TEXT_COLUMNS = ('user_id', 'name', 'email')
+
+
+def export_snapshot(directory, batch_size=10000):
+    """
+    Writes user_data to a columnar snapshot directory.
+
+    The table is read through stream_users_in_batches, so memory stays
+    bounded by one batch. Files are written to a temporary directory that
+    replaces directory only once the export is complete, so readers never
+    see a half-written snapshot.
+
+    Returns:
+        int: The number of rows exported.
+
+    Raises:
+        mysql.connector.Error: If the scan failed part way. The staging
+        directory is removed and any previous snapshot is left in place.
+    """
+    columns = TEXT_COLUMNS + NUMERIC_COLUMNS
+    staging = f"{directory}.tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+
+    try:
+        count = _write_columns(staging, columns, batch_size)
+        with open(os.path.join(staging, 'meta.json'), 'w') as meta:
+            json.dump({
+                'version': SNAPSHOT_VERSION,
+                'rows': count,
+                'byteorder': sys.byteorder,
+                'numeric': list(NUMERIC_COLUMNS),
+                'text': list(TEXT_COLUMNS),
+            }, meta)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(staging, directory)
+    return count
+
+
+def _write_columns(staging, columns, batch_size):
+    # Streams the table into the column files; returns the row count.
+    files = {}
+    offsets = {name: 0 for name in TEXT_COLUMNS}
+    count = 0
+    try:
+        for name in TEXT_COLUMNS:
+            files[name] = open(os.path.join(staging, f"{name}.data"), 'wb')
+            files[f"{name}.offsets"] = open(os.path.join(staging, f"{name}.offsets"), 'wb')
+            array('q', [0]).tofile(files[f"{name}.offsets"])
+        for name in NUMERIC_COLUMNS:
+            files[name] = open(os.path.join(staging, f"{name}.f8"), 'wb')
+
+        # strict: a dropped connection must fail the export, not truncate it.
+        for batch in stream_users_in_batches(batch_size, columns=list(columns),
+                                             row_format='tuple', strict=True):
+            values = list(zip(*batch))
+            for name, column in zip(columns, values):
+                if name in NUMERIC_COLUMNS:
+                    array('d', column).tofile(files[name])
+                    continue
+                encoded = [value.encode() for value in column]
+                ends = array('q')
+                end = offsets[name]
+                for value in encoded:
+                    end += len(value)
+                    ends.append(end)
+                offsets[name] = end
+                files[name].write(b''.join(encoded))
+                ends.tofile(files[f"{name}.offsets"])
+            count += len(batch)
+    finally:
+        for file in files.values():
+            file.close()
+    return count
+
+
+class TextColumn:
+    """A memory-mapped text column; strings are decoded only when read."""
+
+    def __init__(self, offsets, data):
+        self._offsets = offsets
+        self._data = data
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        return bytes(self._data[self._offsets[i]:self._offsets[i + 1]]).decode()
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+class Snapshot:
+    """
+    Read-only, memory-mapped access to a snapshot made by export_snapshot.
+
+    Columns are views straight onto the mapped files: nothing is copied or
+    parsed up front, and the OS page cache is shared between jobs reading
+    the same snapshot. Numeric columns are NumPy arrays when NumPy is
+    installed and memoryviews otherwise.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, 'meta.json')) as meta:
+            self.meta = json.load(meta)
+        if self.meta['version'] != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot version: {self.meta['version']}")
+        if self.meta['byteorder'] != sys.byteorder:
+            raise ValueError("Snapshot was written on a machine with a different byte order")
+        self._maps = []
+
+    def __len__(self):
+        return self.meta['rows']
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def _map(self, filename, typecode):
+        path = os.path.join(self.directory, filename)
+        if os.path.getsize(path) == 0:
+            return memoryview(array(typecode))
+        with open(path, 'rb') as file:
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._maps.append(mapped)
+        view = memoryview(mapped)
+        return view.cast(typecode) if typecode != 'B' else view
+
+    def column(self, name):
+        """Returns a numeric column as an array or a TextColumn."""
+        if name in self.meta['numeric']:
+            view = self._map(f"{name}.f8", 'd')
+            return np.frombuffer(view, dtype=np.float64) if np is not None else view
+        if name in self.meta['text']:
+            return TextColumn(self._map(f"{name}.offsets", 'q'), self._map(f"{name}.data", 'B'))
+        raise KeyError(name)
+
+    def close(self):
+        for mapped in self._maps:
+            try:
+                mapped.close()
+            except BufferError:
+                # A column handed out earlier is still in use; the map is
+                # released when the last view of it is garbage collected.
+                pass
+        self._maps = []
+
+
+def average_age(directory):
+    """calculate_average_age, computed from a snapshot instead of the database."""
+    with Snapshot(directory) as snapshot:
+        ages = snapshot.column('age')
+        if not len(ages):
+            return None
+        return float(ages.mean()) if np is not None else sum(ages) / len(ages)
+
+
+def age_statistics(directory, chunk_size=100000):
+    """user_age_statistics, computed from a snapshot instead of the database."""
+    statistics = StreamStatistics(low=0, high=120, bins=24)
+    with Snapshot(directory) as snapshot:
+        ages = snapshot.column('age')
+        for start in range(0, len(ages), chunk_size):
+            statistics.update_batch(ages[start:start + chunk_size])
+    return statistics.summary()
+
+
+if __name__ == "__main__":
+    rows = export_snapshot('user_data.snapshot')
+    print(f"Exported {rows} rows.")
+    print(f"Average age of users: {average_age('user_data.snapshot')}")
@@ -0,0 +1,308 @@
+import bisect
+import math
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; the pure Python paths are used instead.
+    np = None
+
+
+def _as_floats(values):
+    """Converts a batch (list of Decimals, ints, ...) into floats."""
+    if np is not None:
+        return np.asarray(values, dtype=np.float64)
+    return [float(v) for v in values]
+
+
+class RunningStats:
+    """
+    Count, mean, variance, min and max of a stream in one pass.
+
+    Uses Welford's update for single values and Chan et al.'s pairwise
+    formula to fold in whole batches or other RunningStats, so partial
+    results from several workers can be merged exactly.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def update(self, value):
+        value = float(value)
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def update_batch(self, values):
+        values = _as_floats(values)
+        count = len(values)
+        if not count:
+            return
+        if np is not None:
+            mean = float(values.mean())
+            m2 = float(((values - mean) ** 2).sum())
+            low, high = float(values.min()), float(values.max())
+        else:
+            mean = sum(values) / count
+            m2 = sum((v - mean) ** 2 for v in values)
+            low, high = min(values), max(values)
+        self._combine(count, mean, m2, low, high)
+
+    def merge(self, other):
+        if other.count:
+            self._combine(other.count, other.mean, other._m2, other.min, other.max)
+        return self
+
+    def _combine(self, count, mean, m2, low, high):
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self._m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+        self.min = min(self.min, low)
+        self.max = max(self.max, high)
+
+    @property
+    def variance(self):
+        """The population variance, or 0.0 for fewer than two values."""
+        return self._m2 / self.count if self.count > 1 else 0.0
+
+    @property
+    def stddev(self):
+        return math.sqrt(self.variance)
+
+
+class TDigest:
+    """
+    A mergeable sketch for estimating quantiles in constant memory.
+
+    Values are buffered and periodically compressed into at most about
+    `compression` weighted centroids. Centroids are kept small near the
+    tails (the k1 scale function of Dunning's merging t-digest), so p99 and
+    friends stay accurate while the median gets the coarsest resolution.
+    """
+
+    def __init__(self, compression=100, buffer_size=None):
+        self.compression = compression
+        self.buffer_size = buffer_size or compression * 10
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self._means = []
+        self._weights = []
+        self._buffer = []
+
+    def update(self, value):
+        value = float(value)
+        self._buffer.append(value)
+        self.count += 1
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        if len(self._buffer) >= self.buffer_size:
+            self._compress()
+
+    def update_batch(self, values):
+        values = _as_floats(values)
+        if not len(values):
+            return
+        self.count += len(values)
+        self.min = min(self.min, float(min(values)))
+        self.max = max(self.max, float(max(values)))
+        self._buffer.extend(values.tolist() if np is not None else values)
+        if len(self._buffer) >= self.buffer_size:
+            self._compress()
+
+    def merge(self, other):
+        other._compress()
+        self._compress(other._means, other._weights)
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def quantile(self, q):
+        """
+        Estimates the value below which a fraction q of the stream falls.
+
+        Returns:
+            float: The estimate, or nan if nothing has been added.
+        """
+        self._compress()
+        if not self._means:
+            return math.nan
+        if not 0 <= q <= 1:
+            raise ValueError(f"Quantile must be between 0 and 1, got {q}")
+        # Each centroid's mean is taken to sit at the middle of its weight;
+        # the observed min and max pin down the two ends.
+        positions = [0.0]
+        cumulative = 0.0
+        for weight in self._weights:
+            positions.append(cumulative + weight / 2)
+            cumulative += weight
+        positions.append(cumulative)
+        values = [self.min] + self._means + [self.max]
+        target = q * cumulative
+        if np is not None:
+            return float(np.interp(target, positions, values))
+        i = max(1, bisect.bisect_left(positions, target))
+        left, right = positions[i - 1], positions[i]
+        if right == left:
+            return values[i]
+        return values[i - 1] + (values[i] - values[i - 1]) * (target - left) / (right - left)
+
+    def _k(self, q):
+        return self.compression / (2 * math.pi) * math.asin(2 * q - 1)
+
+    def _compress(self, extra_means=(), extra_weights=()):
+        if not self._buffer and not len(extra_means):
+            return
+        means = self._means + self._buffer + list(extra_means)
+        weights = self._weights + [1.0] * len(self._buffer) + list(extra_weights)
+        self._buffer = []
+
+        # Sort all points, then bucket them by the integer part of the scale
+        # function at each point's left edge: a bucket spans at most one
+        # unit of k, which is what bounds the centroid sizes.
+        if np is not None:
+            means = np.asarray(means)
+            weights = np.asarray(weights)
+            order = np.argsort(means, kind='stable')
+            means, weights = means[order], weights[order]
+            total = weights.sum()
+            left = (np.cumsum(weights) - weights) / total
+            k = self.compression / (2 * np.pi) * np.arcsin(2 * left - 1)
+            buckets = np.floor(k - self._k(0)).astype(np.int64)
+            starts = np.flatnonzero(np.diff(buckets, prepend=buckets[0] - 1))
+            merged_weights = np.add.reduceat(weights, starts)
+            merged_means = np.add.reduceat(means * weights, starts) / merged_weights
+            self._means = merged_means.tolist()
+            self._weights = merged_weights.tolist()
+            return
+
+        points = sorted(zip(means, weights))
+        total = sum(weights)
+        k0 = self._k(0)
+        self._means, self._weights = [], []
+        seen = 0.0
+        current_bucket = None
+        for mean, weight in points:
+            bucket = math.floor(self._k(seen / total) - k0)
+            seen += weight
+            if bucket == current_bucket:
+                merged = self._weights[-1] + weight
+                self._means[-1] += (mean - self._means[-1]) * weight / merged
+                self._weights[-1] = merged
+            else:
+                self._means.append(mean)
+                self._weights.append(weight)
+                current_bucket = bucket
+
+
+class Histogram:
+    """
+    Fixed-width histogram over [low, high), with counters for values that
+    fall outside the range. Histograms with the same bins merge by adding.
+    """
+
+    def __init__(self, low=0, high=100, bins=20):
+        self.low = low
+        self.high = high
+        self.bins = bins
+        self.width = (high - low) / bins
+        self.counts = [0] * bins
+        self.underflow = 0
+        self.overflow = 0
+
+    def update_batch(self, values):
+        values = _as_floats(values)
+        if np is not None:
+            self.underflow += int((values < self.low).sum())
+            self.overflow += int((values >= self.high).sum())
+            counts, _ = np.histogram(values, bins=self.bins, range=(self.low, self.high))
+            # np.histogram closes the last bin on the right; keep it half-open.
+            counts[-1] -= int((values == self.high).sum())
+            self.counts = [c + int(n) for c, n in zip(self.counts, counts)]
+            return
+        for value in values:
+            self.update(value)
+
+    def update(self, value):
+        value = float(value)
+        if value < self.low:
+            self.underflow += 1
+        elif value >= self.high:
+            self.overflow += 1
+        else:
+            self.counts[min(int((value - self.low) / self.width), self.bins - 1)] += 1
+
+    def merge(self, other):
+        if (other.low, other.high, other.bins) != (self.low, self.high, self.bins):
+            raise ValueError("Cannot merge histograms with different bins")
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.underflow += other.underflow
+        self.overflow += other.overflow
+        return self
+
+    def edges(self):
+        return [self.low + i * self.width for i in range(self.bins + 1)]
+
+
+class StreamStatistics:
+    """
+    One-pass summary of a numeric stream: moments, quantiles and histogram.
+
+    Feed it batches with update_batch() (vectorized when NumPy is present)
+    or single values with update(). Instances built by separate workers can
+    be combined with merge().
+    """
+
+    def __init__(self, compression=100, low=0, high=100, bins=20):
+        self.moments = RunningStats()
+        self.digest = TDigest(compression)
+        self.histogram = Histogram(low, high, bins)
+
+    def update(self, value):
+        self.moments.update(value)
+        self.digest.update(value)
+        self.histogram.update(value)
+
+    def update_batch(self, values):
+        values = _as_floats(values)
+        self.moments.update_batch(values)
+        self.digest.update_batch(values)
+        self.histogram.update_batch(values)
+
+    def merge(self, other):
+        self.moments.merge(other.moments)
+        self.digest.merge(other.digest)
+        self.histogram.merge(other.histogram)
+        return self
+
+    def summary(self, quantiles=(0.5, 0.95, 0.99)):
+        """
+        Returns:
+            dict: count, mean, stddev, min, max, the requested quantiles
+            keyed as p50/p95/..., and the histogram edges and counts.
+        """
+        summary = {
+            'count': self.moments.count,
+            'mean': self.moments.mean,
+            'stddev': self.moments.stddev,
+            'min': self.moments.min,
+            'max': self.moments.max,
+        }
+        for q in quantiles:
+            summary[f"p{q * 100:g}"] = self.digest.quantile(q)
+        summary['histogram'] = {
+            'edges': self.histogram.edges(),
+            'counts': list(self.histogram.counts),
+            'underflow': self.histogram.underflow,
+            'overflow': self.histogram.overflow,
+        }
+        return summary
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Unit tests for async_streams.py
+
+Covers:
+- more concurrent streams than pooled connections all finishing
+- connections going back to the pool when a stream is closed early
+"""
+
+import asyncio
+import unittest
+from test_pool import ROWS, PooledSQLiteTestCase
+from async_streams import (async_lazy_paginate, async_stream_user_ages,
+                           async_stream_users, async_stream_users_in_batches)
+
+
+class TestAsyncStreams(PooledSQLiteTestCase):
+    """The async generators over a pool of two connections"""
+
+    def test_more_streams_than_connections(self):
+        """Streams beyond the pool size wait their turn instead of timing out"""
+        async def count(batch_size):
+            total = 0
+            async for batch in async_stream_users_in_batches(batch_size):
+                total += len(batch)
+            return total
+
+        async def main():
+            return await asyncio.gather(*(count(50) for _ in range(6)))
+
+        self.assertEqual(asyncio.run(main()), [ROWS] * 6)
+        self.assertEqual(self.in_use(), 0)
+        self.assertEqual(self.pool.stats()['timeouts'], 0)
+
+    def assertReturnedOnClose(self, stream):
+        async def main():
+            await stream.__anext__()
+            self.assertEqual(self.in_use(), 1)
+            await stream.aclose()
+            self.assertEqual(self.in_use(), 0)
+
+        asyncio.run(main())
+
+    def test_async_stream_users(self):
+        """async_stream_users"""
+        self.assertReturnedOnClose(async_stream_users(50))
+
+    def test_async_stream_users_prefetch(self):
+        """async_stream_users with chunks fetched ahead"""
+        self.assertReturnedOnClose(async_stream_users(50, prefetch=2))
+
+    def test_async_stream_users_in_batches(self):
+        """async_stream_users_in_batches"""
+        self.assertReturnedOnClose(async_stream_users_in_batches(50))
+
+    def test_async_stream_user_ages(self):
+        """async_stream_user_ages"""
+        self.assertReturnedOnClose(async_stream_user_ages(50))
+
+    def test_async_lazy_paginate(self):
+        """async_lazy_paginate checks out per page; none may be left out"""
+        async def main():
+            pages = async_lazy_paginate(50, prefetch=2)
+            await pages.__anext__()
+            await pages.aclose()
+
+        asyncio.run(main())
+        self.assertEqual(self.in_use(), 0)
+
+    def test_break_returns_connection(self):
+        """Leaving an async for early returns the connection too"""
+        async def main():
+            async for _ in async_stream_users_in_batches(50):
+                break
+            # the loop finalizes the abandoned generator on its next turn
+            await asyncio.sleep(0.1)
+            return self.in_use()
+
+        self.assertEqual(asyncio.run(main()), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Unit tests for instrument.py and the streams that use it
+
+Covers:
+- lazy_paginate, in both 2-lazy_paginate.py and 4-stream_ages.py,
+  reporting its pages, rows and connection checkout time
+- instrumentation costing nothing while disabled
+- the Prometheus rendering of stream counters and pool stats
+"""
+
+import unittest
+import instrument
+from test_pool import ROWS, PooledSQLiteTestCase
+
+LAZY_PAGINATE = {
+    '2-lazy_paginate': __import__('2-lazy_paginate').lazy_paginate,
+    '4-stream_ages': __import__('4-stream_ages').lazy_paginate,
+}
+
+
+class TestInstrumentedStreams(PooledSQLiteTestCase):
+    """Instrumentation over the SQLite-backed pool"""
+
+    def setUp(self):
+        super().setUp()
+        self.summaries = []
+        instrument.enable(report=self.summaries.append)
+        self.addCleanup(instrument.disable)
+
+    def test_lazy_paginate(self):
+        """Both copies of lazy_paginate report a run"""
+        for module, lazy_paginate in LAZY_PAGINATE.items():
+            for prefetch in (0, 2):
+                with self.subTest(module=module, prefetch=prefetch):
+                    del self.summaries[:]
+                    pages = list(lazy_paginate(100, prefetch=prefetch))
+                    summary, = self.summaries
+                    self.assertEqual(summary['stream'], 'lazy_paginate')
+                    self.assertEqual(summary['rows'], ROWS)
+                    self.assertEqual(summary['batches'], len(pages))
+                    self.assertGreater(summary['connect_seconds'], 0)
+
+    def test_disabled(self):
+        """With instrumentation off the source is handed back untouched"""
+        instrument.disable()
+        source = iter([[1], [2]])
+        self.assertIs(instrument.instrumented(source, instrument.start_run('x')), source)
+        list(LAZY_PAGINATE['4-stream_ages'](100))
+        self.assertEqual(self.summaries, [])
+
+    def test_render_metrics(self):
+        """Every metric gets a # TYPE line of the right kind"""
+        list(LAZY_PAGINATE['4-stream_ages'](100))
+        lines = instrument.render_metrics().splitlines()
+        self.assertIn('# TYPE user_stream_rows_total counter', lines)
+        self.assertTrue(any(line.startswith('user_stream_rows_total{stream="lazy_paginate"}')
+                            for line in lines))
+        self.assertIn('# TYPE user_pool_checkouts counter', lines)
+        self.assertIn('# TYPE user_pool_idle gauge', lines)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Unit tests for keyset.py
+
+Covers:
+- continuation tokens round-tripping, and bad tokens being rejected
+- keyset pages covering the table exactly once, in order, including on
+  non-unique sort keys whose ties straddle page boundaries
+"""
+
+import sqlite3
+import unittest
+from test_pool import ROWS, PooledSQLiteTestCase
+from keyset import (_pack, decode_token, encode_token, keyset_paginate,
+                    paginate_users_after)
+
+
+class TestTokens(unittest.TestCase):
+    """encode_token / decode_token"""
+
+    def test_user_id(self):
+        """A user_id token only needs the last user_id"""
+        token = encode_token('user_id', {'user_id': 'abc', 'age': 30})
+        self.assertEqual(decode_token(token), ('user_id', ['abc']))
+
+    def test_tie_breaker(self):
+        """Other sort keys carry the user_id along to break ties"""
+        token = encode_token('age', {'user_id': 'abc', 'age': 30})
+        self.assertEqual(decode_token(token), ('age', [30, 'abc']))
+
+    def test_invalid(self):
+        """Garbage, or a token missing its fields, is a ValueError"""
+        for token in ('not-a-token', _pack({'key': 'age'})):
+            with self.subTest(token=token):
+                with self.assertRaises(ValueError):
+                    decode_token(token)
+
+
+class TestKeysetPagination(PooledSQLiteTestCase):
+    """Paging through a table where ages and names repeat a lot"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        db = sqlite3.connect(cls.path)
+        db.execute("UPDATE user_data SET age = 20 + rowid % 3, name = 'User ' || (rowid % 5)")
+        db.commit()
+        db.close()
+
+    def collect(self, sort_key, page_size=7):
+        pages = list(keyset_paginate(page_size, sort_key=sort_key))
+        self.assertTrue(all(len(page) == page_size for page in pages[:-1]))
+        return [row for page in pages for row in page]
+
+    def assertCoversInOrder(self, rows, key):
+        ids = [row['user_id'] for row in rows]
+        self.assertEqual(len(ids), ROWS)
+        self.assertEqual(len(set(ids)), ROWS)
+        self.assertEqual([key(row) for row in rows], sorted(key(row) for row in rows))
+
+    def test_user_id(self):
+        """Pages on the primary key"""
+        rows = self.collect('user_id')
+        self.assertCoversInOrder(rows, lambda row: row['user_id'])
+
+    def test_ties(self):
+        """Pages on age and name, which take only a handful of values each"""
+        for sort_key in ('age', 'name'):
+            with self.subTest(sort_key=sort_key):
+                rows = self.collect(sort_key)
+                self.assertCoversInOrder(rows, lambda row: (row[sort_key], row['user_id']))
+
+    def test_resume_from_token(self):
+        """A token picks up exactly where its page ended"""
+        first, token = paginate_users_after(10, sort_key='age')
+        rest = [row for page in keyset_paginate(10, sort_key='age', token=token)
+                for row in page]
+        ids = [row['user_id'] for row in first + rest]
+        self.assertEqual(len(set(ids)), ROWS)
+        self.assertEqual(len(ids), ROWS)
+
+    def test_exact_multiple(self):
+        """A last page that is exactly full ends the stream with no empty page"""
+        pages = list(keyset_paginate(ROWS // 5))
+        self.assertEqual([len(page) for page in pages], [ROWS // 5] * 5)
+
+    def test_bad_sort_key(self):
+        """Only the known sort keys are accepted, and tokens stay with theirs"""
+        with self.assertRaises(ValueError):
+            paginate_users_after(10, sort_key='user_id; DROP TABLE user_data')
+        _, token = paginate_users_after(10, sort_key='age')
+        with self.assertRaises(ValueError):
+            paginate_users_after(10, token=token, sort_key='name')
+
+
+if __name__ == '__main__':
+    unittest.main()
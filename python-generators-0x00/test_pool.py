@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Unit tests for pool.py and the way the generators use it
+
+Covers:
+- pool exhaustion raising PoolTimeout, also out of a stream
+- strict streams raising when no connection can be opened
+- connections going back to the pool when a stream is closed early
+- closed pools closing connections on release, and idle expiry
+
+The streams run against a SQLite file through benchmark.SQLiteConnection,
+so no MySQL server is needed.
+"""
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest.mock import MagicMock
+from mysql.connector import Error
+from benchmark import SQLiteConnection, populate_sqlite
+from pool import ConnectionPool, PoolTimeout, configure_pool
+
+stream_users = __import__('0-stream_users').stream_users
+stream_users_in_batches = __import__('1-batch_processing').stream_users_in_batches
+lazy_paginate = __import__('2-lazy_paginate').lazy_paginate
+
+ROWS = 500
+
+
+class PooledSQLiteTestCase(unittest.TestCase):
+    """Points the shared pool at a fresh SQLite user_data table"""
+
+    max_size = 2
+
+    @classmethod
+    def setUpClass(cls):
+        cls.scratch = tempfile.mkdtemp()
+        cls.path = os.path.join(cls.scratch, 'user_data.db')
+        populate_sqlite(cls.path, ROWS)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.scratch, ignore_errors=True)
+
+    def setUp(self):
+        self.pool = configure_pool(connect=lambda: SQLiteConnection(self.path),
+                                   max_size=self.max_size, checkout_timeout=0.2)
+
+    def tearDown(self):
+        self.pool.close_all()
+
+    def in_use(self):
+        return self.pool.stats()['in_use']
+
+
+class TestPoolExhaustion(PooledSQLiteTestCase):
+    """A full pool must surface as an error, never as an empty table"""
+
+    def test_acquire_times_out(self):
+        """acquire() raises PoolTimeout once every connection is out"""
+        held = [self.pool.acquire() for _ in range(self.max_size)]
+        with self.assertRaises(PoolTimeout):
+            self.pool.acquire()
+        self.assertEqual(self.pool.stats()['timeouts'], 1)
+        for connection in held:
+            self.pool.release(connection)
+
+    def test_pool_timeout_is_not_a_database_error(self):
+        """The generators' 'except Error' handlers must not catch it"""
+        self.assertFalse(issubclass(PoolTimeout, Error))
+
+    def test_stream_raises_when_pool_is_exhausted(self):
+        """A stream that can't get a connection raises PoolTimeout"""
+        held = [self.pool.acquire() for _ in range(self.max_size)]
+        try:
+            with self.assertRaises(PoolTimeout):
+                list(stream_users_in_batches(100))
+        finally:
+            for connection in held:
+                self.pool.release(connection)
+
+    def test_released_connection_is_reused(self):
+        """After a release the next stream gets the idle connection"""
+        self.assertEqual(sum(len(b) for b in stream_users_in_batches(100)), ROWS)
+        self.assertEqual(sum(len(b) for b in stream_users_in_batches(100)), ROWS)
+        self.assertEqual(self.pool.stats()['created'], 1)
+
+
+class TestStrictStreams(PooledSQLiteTestCase):
+    """strict=True turns connection failures into exceptions"""
+
+    def setUp(self):
+        self.pool = configure_pool(connect=lambda: None, max_size=1)
+
+    def test_strict_stream_raises(self):
+        """A strict stream raises when no connection could be opened"""
+        with self.assertRaises(Error):
+            list(stream_users_in_batches(100, strict=True))
+
+    def test_default_stream_stays_lenient(self):
+        """Without strict the stream just ends, as before"""
+        self.assertEqual(list(stream_users_in_batches(100)), [])
+
+
+class TestEarlyClose(PooledSQLiteTestCase):
+    """Closing a stream early returns its connection straight away"""
+
+    def assertReturnedOnClose(self, stream):
+        next(stream)
+        self.assertEqual(self.in_use(), 1)
+        stream.close()
+        self.assertEqual(self.in_use(), 0)
+
+    def test_stream_users(self):
+        """stream_users"""
+        self.assertReturnedOnClose(stream_users(50))
+
+    def test_stream_users_in_batches(self):
+        """stream_users_in_batches"""
+        self.assertReturnedOnClose(stream_users_in_batches(50))
+
+    def test_stream_users_in_batches_prefetch(self):
+        """stream_users_in_batches with a prefetch thread"""
+        self.assertReturnedOnClose(stream_users_in_batches(50, prefetch=2))
+
+    def test_lazy_paginate_prefetch(self):
+        """lazy_paginate checks out per page; none may be left out"""
+        pages = lazy_paginate(50, prefetch=2)
+        next(pages)
+        pages.close()
+        self.assertEqual(self.in_use(), 0)
+
+
+class TestClosingPool(unittest.TestCase):
+    """close_all() and idle expiry, with stub connections"""
+
+    def test_release_to_closed_pool(self):
+        """A connection out while the pool is replaced is closed on release"""
+        old = configure_pool(connect=MagicMock, max_size=2)
+        connection = old.acquire()
+        new = configure_pool(connect=MagicMock, max_size=2)
+        self.addCleanup(new.close_all)
+        connection.close.assert_not_called()
+        old.release(connection)
+        connection.close.assert_called_once_with()
+        self.assertEqual(old.stats()['size'], 0)
+
+    def test_expired_connections_reaped_on_release(self):
+        """Idle connections past idle_timeout go when another one comes back"""
+        pool = ConnectionPool(connect=MagicMock, max_size=2, idle_timeout=0.01)
+        first, second = pool.acquire(), pool.acquire()
+        pool.release(first)
+        time.sleep(0.02)
+        pool.release(second)
+        first.close.assert_called_once_with()
+        second.close.assert_not_called()
+        self.assertEqual(pool.stats()['reaped'], 1)
+        self.assertEqual(pool.stats()['idle'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Unit tests for query.py and the filter push-down in batch streaming
+
+Covers:
+- the SQL and parameters Predicates and build_select() generate
+- column names being checked before they reach the SQL text
+- where= and columns= giving the same rows as filtering in Python
+"""
+
+import sqlite3
+import unittest
+from test_pool import PooledSQLiteTestCase
+from query import Predicate, build_select, col
+
+stream_users_in_batches = __import__('1-batch_processing').stream_users_in_batches
+
+
+class TestPredicates(unittest.TestCase):
+    """Predicate building and combining"""
+
+    def test_comparisons(self):
+        """Each operator becomes a placeholder comparison"""
+        cases = [
+            (col('age') == 30, "age = %s", (30,)),
+            (col('age') != 30, "age <> %s", (30,)),
+            (col('age') < 30, "age < %s", (30,)),
+            (col('age') <= 30, "age <= %s", (30,)),
+            (col('age') > 30, "age > %s", (30,)),
+            (col('age') >= 30, "age >= %s", (30,)),
+            (col('age').between(20, 30), "age BETWEEN %s AND %s", (20, 30)),
+            (col('user_id').isin(['a', 'b']), "user_id IN (%s, %s)", ('a', 'b')),
+            (col('email').like('%@x.com'), "email LIKE %s", ('%@x.com',)),
+        ]
+        for predicate, sql, params in cases:
+            with self.subTest(sql=sql):
+                self.assertEqual((predicate.sql, predicate.params), (sql, params))
+
+    def test_combining(self):
+        """&, | and ~ nest with parentheses and keep the parameters in order"""
+        predicate = ~((col('age') > 25) & col('name').like('A%') | col('age').isin([1]))
+        self.assertEqual(predicate.sql,
+                         "(NOT ((age > %s AND name LIKE %s) OR age IN (%s)))")
+        self.assertEqual(predicate.params, (25, 'A%', 1))
+
+    def test_values_stay_out_of_sql(self):
+        """A hostile value only ever travels as a parameter"""
+        predicate = col('name') == "x' OR '1'='1"
+        self.assertNotIn("OR", predicate.sql)
+        self.assertEqual(predicate.params, ("x' OR '1'='1",))
+
+    def test_empty_isin(self):
+        """An empty IN list matches nothing instead of being a syntax error"""
+        predicate = col('user_id').isin([])
+        self.assertEqual((predicate.sql, predicate.params), ("1 = 0", ()))
+
+    def test_unknown_column(self):
+        """Column names outside user_data are rejected"""
+        for name in ('password', 'age; DROP TABLE user_data', ''):
+            with self.subTest(name=name):
+                with self.assertRaises(ValueError):
+                    col(name)
+
+
+class TestBuildSelect(unittest.TestCase):
+    """build_select() SQL generation"""
+
+    def test_defaults(self):
+        """No arguments selects everything"""
+        self.assertEqual(build_select(), ("SELECT * FROM user_data", ()))
+
+    def test_full(self):
+        """Projection, filter and order in the right places"""
+        sql, params = build_select(['user_id', 'age'], col('age') > 30, ['age', 'user_id'])
+        self.assertEqual(sql, "SELECT user_id, age FROM user_data "
+                              "WHERE age > %s ORDER BY age, user_id")
+        self.assertEqual(params, (30,))
+
+    def test_checks_columns(self):
+        """Projected and ordering columns are validated too"""
+        with self.assertRaises(ValueError):
+            build_select(columns=['user_id', '1; DROP TABLE user_data'])
+        with self.assertRaises(ValueError):
+            build_select(order_by=['age DESC'])
+
+
+class TestPushDown(PooledSQLiteTestCase):
+    """where= and columns= run in SQLite, not in Python"""
+
+    def expected(self, sql, params=()):
+        db = sqlite3.connect(self.path)
+        try:
+            return sorted(db.execute(sql, params).fetchall())
+        finally:
+            db.close()
+
+    def fetch(self, **kwargs):
+        return sorted(row for batch in stream_users_in_batches(37, row_format='tuple', **kwargs)
+                      for row in batch)
+
+    def test_where(self):
+        """Only matching rows come back"""
+        where = (col('age') >= 30) & (col('age') < 60) | col('email').like('user1%')
+        rows = self.fetch(where=where)
+        self.assertEqual(rows, self.expected(
+            "SELECT * FROM user_data WHERE (age >= 30 AND age < 60) OR email LIKE 'user1%'"))
+        self.assertTrue(0 < len(rows) < 500)
+
+    def test_columns(self):
+        """Only the requested columns come back, in the requested order"""
+        rows = self.fetch(columns=['age', 'user_id'], where=col('age') > 90)
+        self.assertEqual(rows, self.expected(
+            "SELECT age, user_id FROM user_data WHERE age > 90"))
+        self.assertTrue(all(len(row) == 2 for row in rows))
+
+    def test_no_match(self):
+        """A filter nothing matches gives an empty stream"""
+        self.assertEqual(self.fetch(where=col('user_id').isin([])), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
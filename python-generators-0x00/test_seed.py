@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Unit tests for seed.py
+
+Covers:
+- sync_csv counting each row once, whether its chunk commits or fails
+- csv_split_points cutting on line boundaries
+- read_csv_chunks_parallel matching read_csv_chunks row for row
+"""
+
+import contextlib
+import csv
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+from mysql.connector import Error
+from seed import (csv_split_points, read_csv_chunks, read_csv_chunks_parallel,
+                  row_hash, sync_csv)
+
+ROWS = [(f'id-{i}', f'User {i}', f'user{i}@example.com', 20 + i * 0.5) for i in range(10)]
+
+
+def write_csv(path, rows, extra_lines=()):
+    """Writes a user_data CSV with a header, then any raw extra_lines"""
+    with open(path, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(['user_id', 'name', 'email', 'age'])
+        writer.writerows(rows)
+        for line in extra_lines:
+            file.write(line + '\r\n')
+
+
+def drain(chunks):
+    """Runs a chunk generator to the end: (all rows, skipped count)"""
+    rows = []
+    while True:
+        try:
+            rows.extend(next(chunks))
+        except StopIteration as done:
+            return rows, done.value
+
+
+def stub_connection(stored=(), executemany=None, commit=None):
+    """A connection whose table holds stored rows, hashed the way MySQL would"""
+    connection = MagicMock()
+    cursor = connection.cursor.return_value
+    cursor.fetchall.return_value = [(row[0], row_hash(row)) for row in stored]
+    cursor.executemany.side_effect = executemany
+    connection.commit.side_effect = commit
+    return connection
+
+
+class TestSyncCsv(unittest.TestCase):
+    """sync_csv against a stub connection"""
+
+    def setUp(self):
+        self.scratch = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.scratch, ignore_errors=True)
+        self.path = os.path.join(self.scratch, 'user_data.csv')
+        write_csv(self.path, ROWS)
+
+    def sync(self, connection):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return sync_csv(connection, self.path, chunk_size=4)
+
+    def test_classifies_rows(self):
+        """New, changed and unchanged rows are told apart by their hash"""
+        changed = (*ROWS[1][:2], 'new@example.com', ROWS[1][3])
+        stats = self.sync(stub_connection(stored=[ROWS[0], changed]))
+        self.assertEqual((stats['inserted'], stats['updated'], stats['unchanged']), (8, 1, 1))
+        self.assertEqual(stats['failed'], 0)
+
+    def test_failed_upsert_counts_once(self):
+        """Rows of a chunk whose upsert fails are only counted as failed"""
+        stats = self.sync(stub_connection(executemany=Error('Lost connection')))
+        self.assertEqual(stats['failed'], len(ROWS))
+        self.assertEqual(stats['inserted'] + stats['updated'] + stats['unchanged'], 0)
+
+    def test_failed_commit_counts_once(self):
+        """A chunk whose commit fails isn't also counted as inserted"""
+        outcomes = [None, Error('Deadlock found'), None]
+        stats = self.sync(stub_connection(commit=outcomes))
+        self.assertEqual(stats['failed'], 4)
+        self.assertEqual(stats['inserted'], len(ROWS) - 4)
+
+
+class TestParallelCsv(unittest.TestCase):
+    """csv_split_points and read_csv_chunks_parallel on a small file"""
+
+    def setUp(self):
+        self.scratch = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.scratch, ignore_errors=True)
+        self.path = os.path.join(self.scratch, 'user_data.csv')
+        rows = [(f'id-{i}', f'Doe, Jane {i}', f'jane{i}@example.com', 18 + i % 80 + 0.25)
+                for i in range(500)]
+        # bad rows spread through the file: a short one, a bad age, a blank line
+        write_csv(self.path, rows[:150], ['id-x,Nobody'])
+        with open(self.path, 'a', newline='') as file:
+            csv.writer(file).writerows(rows[150:300])
+            file.write('id-y,"Quoted, Name",y@example.com,not-a-number\r\n\r\n')
+            csv.writer(file).writerows(rows[300:])
+
+    def test_split_points(self):
+        """Ranges are contiguous, skip the header and end on newlines"""
+        with open(self.path, 'rb') as file:
+            data = file.read()
+        ranges = csv_split_points(self.path, split_bytes=256)
+        self.assertGreater(len(ranges), 10)
+        self.assertEqual(ranges[0][0], data.index(b'\n') + 1)
+        self.assertEqual(ranges[-1][1], len(data))
+        for (_, end), (start, _) in zip(ranges, ranges[1:]):
+            self.assertEqual(end, start)
+        for start, end in ranges:
+            self.assertEqual(data[end - 1:end], b'\n')
+
+    def test_split_points_empty(self):
+        """Empty and header-only files have nothing to parse"""
+        empty = os.path.join(self.scratch, 'empty.csv')
+        open(empty, 'w').close()
+        self.assertEqual(csv_split_points(empty), [])
+        header = os.path.join(self.scratch, 'header.csv')
+        write_csv(header, [])
+        self.assertEqual(csv_split_points(header), [])
+
+    def test_matches_sequential(self):
+        """Same rows in the same order, and the same number skipped"""
+        expected, skipped = drain(read_csv_chunks(self.path, chunk_size=64))
+        self.assertEqual(len(expected), 500)
+        self.assertEqual(skipped, 3)
+        for split_bytes in (64, 1000, 1 << 20):
+            with self.subTest(split_bytes=split_bytes):
+                rows, bad = drain(read_csv_chunks_parallel(
+                    self.path, chunk_size=64, processes=2, split_bytes=split_bytes))
+                self.assertEqual(rows, expected)
+                self.assertEqual(bad, skipped)
+
+    def test_chunk_sizes(self):
+        """No chunk is larger than chunk_size"""
+        chunks = read_csv_chunks_parallel(self.path, chunk_size=50, processes=2,
+                                          split_bytes=512)
+        self.assertTrue(all(0 < len(chunk) <= 50 for chunk in chunks))
+
+
+if __name__ == '__main__':
+    unittest.main()
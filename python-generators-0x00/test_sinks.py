@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Unit tests for sinks.py
+
+Covers:
+- CSV and JSON Lines output for the row shapes the streams produce
+- gzip output and buffered writes
+- rows written to stdout staying behind text printed before them
+"""
+
+import csv
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from decimal import Decimal
+from unittest.mock import patch
+from sinks import CSVSink, JSONLSink
+
+ROWS = [
+    {'user_id': 'a', 'name': 'Ann', 'email': 'ann@example.com', 'age': Decimal('30.50')},
+    ('b', 'Bob, Jr.', 'bob@example.com', 41.0),
+]
+
+
+class TestSinks(unittest.TestCase):
+    """Sinks writing to files in a scratch directory"""
+
+    def setUp(self):
+        self.scratch = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.scratch, ignore_errors=True)
+
+    def path(self, name):
+        return os.path.join(self.scratch, name)
+
+    def test_jsonl(self):
+        """One object per line; Decimals become numbers"""
+        with JSONLSink(self.path('users.jsonl')) as sink:
+            sink.write_batch(ROWS)
+        with open(self.path('users.jsonl')) as file:
+            lines = [json.loads(line) for line in file]
+        self.assertEqual(lines[0]['age'], 30.5)
+        self.assertEqual(lines[1], {'user_id': 'b', 'name': 'Bob, Jr.',
+                                    'email': 'bob@example.com', 'age': 41.0})
+
+    def test_csv_gzip(self):
+        """A .gz path is compressed; the header comes once"""
+        with CSVSink(self.path('users.csv.gz')) as sink:
+            sink.write_batch(ROWS[:1])
+            sink.write_batch(ROWS[1:])
+        with gzip.open(self.path('users.csv.gz'), 'rt', newline='') as file:
+            rows = list(csv.reader(file))
+        self.assertEqual(rows[0], ['user_id', 'name', 'email', 'age'])
+        self.assertEqual(rows[2], ['b', 'Bob, Jr.', 'bob@example.com', '41.0'])
+        self.assertEqual(len(rows), 3)
+
+    def test_buffering(self):
+        """Nothing reaches the file until the buffer fills or the sink closes"""
+        sink = JSONLSink(self.path('users.jsonl'), buffer_size=1 << 20)
+        sink.write_stream(iter(ROWS * 10), batch_size=4)
+        self.assertEqual(os.path.getsize(self.path('users.jsonl')), 0)
+        sink.close()
+        self.assertEqual(sink.stats()['rows'], 20)
+        self.assertEqual(os.path.getsize(self.path('users.jsonl')), sink.stats()['bytes'])
+
+    def test_stdout_order(self):
+        """Text printed by the row generator comes out before the rows"""
+        stdout = io.TextIOWrapper(io.BytesIO(), write_through=False)
+
+        def rows():
+            print("Streaming data from the database...")
+            yield from ROWS
+
+        with patch('sys.stdout', stdout):
+            with JSONLSink('-') as sink:
+                sink.write_stream(rows())
+            print("done")
+            stdout.flush()
+        lines = stdout.buffer.getvalue().decode().splitlines()
+        self.assertEqual(lines[0], "Streaming data from the database...")
+        self.assertEqual(json.loads(lines[1])['user_id'], 'a')
+        self.assertEqual(lines[-1], "done")
+
+
+if __name__ == '__main__':
+    unittest.main()
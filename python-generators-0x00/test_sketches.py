@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Unit tests for sketches.py
+
+Covers:
+- ReservoirSample: Algorithm L skips in update_batch matching update(),
+  uniform inclusion, and merged samples staying uniform
+- HyperLogLog cardinality error and merging
+- CountMinSketch bounds and merging
+- TopK (Space-Saving) error bounds and merging
+"""
+
+import math
+import random
+import unittest
+from collections import Counter
+from sketches import CountMinSketch, HyperLogLog, ReservoirSample, TopK
+
+TRIALS = 2000
+
+
+def chunks(values, size):
+    return [values[i:i + size] for i in range(0, len(values), size)]
+
+
+class TestReservoirSample(unittest.TestCase):
+    """ReservoirSample over streams of integers"""
+
+    def assertUniform(self, counts, population, picks):
+        """Each tenth of the population got its share of picks, within 5 sigma"""
+        expected = picks / 10
+        sigma = math.sqrt(expected * 0.9)
+        deciles = Counter(value * 10 // population for value in counts.elements())
+        for decile in range(10):
+            with self.subTest(decile=decile):
+                self.assertLess(abs(deciles[decile] - expected), 5 * sigma)
+
+    def test_batch_matches_update(self):
+        """update_batch's skips land on the same items update() would take"""
+        values = list(range(5000))
+        for batch_size in (1, 7, 100, 999, 5000):
+            with self.subTest(batch_size=batch_size):
+                one = ReservoirSample(20, seed=batch_size)
+                for value in values:
+                    one.update(value)
+                batched = ReservoirSample(20, seed=batch_size)
+                for batch in chunks(values, batch_size):
+                    batched.update_batch(batch)
+                self.assertEqual(batched.items, one.items)
+                self.assertEqual(batched.count, one.count)
+
+    def test_short_stream(self):
+        """A stream shorter than the sample is kept whole"""
+        sample = ReservoirSample(10, seed=1)
+        sample.update_batch([1, 2, 3])
+        sample.update_batch([4])
+        self.assertEqual(sample.items, [1, 2, 3, 4])
+        self.assertEqual(sample.count, 4)
+
+    def test_uniform(self):
+        """Every item is equally likely to end up in the sample"""
+        counts = Counter()
+        values = list(range(1000))
+        for seed in range(TRIALS):
+            sample = ReservoirSample(10, seed=seed)
+            for batch in chunks(values, 128):
+                sample.update_batch(batch)
+            self.assertEqual(len(set(sample.items)), 10)
+            counts.update(sample.items)
+        self.assertUniform(counts, 1000, TRIALS * 10)
+
+    def test_merge_uniform(self):
+        """Merged samples of uneven streams are uniform over both"""
+        counts = Counter()
+        for seed in range(TRIALS):
+            left = ReservoirSample(10, seed=seed)
+            left.update_batch(list(range(300)))
+            right = ReservoirSample(10, seed=seed + TRIALS)
+            right.update_batch(list(range(300, 1000)))
+            left.merge(right)
+            self.assertEqual(left.count, 1000)
+            self.assertEqual(len(left.items), 10)
+            counts.update(left.items)
+        self.assertUniform(counts, 1000, TRIALS * 10)
+
+    def test_update_after_merge(self):
+        """A merged sample keeps sampling uniformly as more items arrive"""
+        counts = Counter()
+        for seed in range(TRIALS):
+            left = ReservoirSample(10, seed=seed)
+            left.update_batch(list(range(250)))
+            right = ReservoirSample(10, seed=seed + TRIALS)
+            right.update_batch(list(range(250, 500)))
+            left.merge(right)
+            left.update_batch(list(range(500, 1000)))
+            counts.update(left.items)
+        self.assertUniform(counts, 1000, TRIALS * 10)
+
+    def test_merge_empty(self):
+        """Merging an empty sample changes nothing"""
+        sample = ReservoirSample(5, seed=3)
+        sample.update_batch(list(range(50)))
+        items = list(sample.items)
+        sample.merge(ReservoirSample(5))
+        self.assertEqual((sample.items, sample.count), (items, 50))
+
+
+class TestHyperLogLog(unittest.TestCase):
+    """HyperLogLog estimates against known cardinalities"""
+
+    def test_cardinality(self):
+        """Estimates fall within 3 standard errors"""
+        for precision, n in ((14, 100), (14, 5000), (14, 100000), (12, 50000)):
+            with self.subTest(precision=precision, n=n):
+                sketch = HyperLogLog(precision)
+                sketch.update_batch([f'user-{i}' for i in range(n)])
+                error = 1.04 / math.sqrt(1 << precision)
+                self.assertLess(abs(sketch.cardinality() - n) / n, 3 * error)
+
+    def test_duplicates(self):
+        """Repeated values don't count again"""
+        sketch = HyperLogLog()
+        for _ in range(5):
+            sketch.update_batch([f'user-{i}' for i in range(1000)])
+        self.assertAlmostEqual(sketch.cardinality(), 1000, delta=30)
+
+    def test_merge(self):
+        """Merged overlapping sketches equal the sketch of the union"""
+        left, right, union = HyperLogLog(12), HyperLogLog(12), HyperLogLog(12)
+        left.update_batch(range(0, 30000))
+        right.update_batch(range(20000, 50000))
+        union.update_batch(range(0, 50000))
+        self.assertEqual(left.merge(right).registers, union.registers)
+
+    def test_invalid(self):
+        """Precision is checked, also on merge"""
+        with self.assertRaises(ValueError):
+            HyperLogLog(3)
+        with self.assertRaises(ValueError):
+            HyperLogLog(12).merge(HyperLogLog(14))
+
+
+class TestCountMinSketch(unittest.TestCase):
+    """CountMinSketch over a skewed stream"""
+
+    def setUp(self):
+        rng = random.Random(7)
+        self.values = [int(rng.paretovariate(1.2)) for _ in range(50000)]
+        self.exact = Counter(self.values)
+
+    def test_bounds(self):
+        """Never under, and over by at most e / width * total"""
+        sketch = CountMinSketch(width=512, depth=5)
+        sketch.update_batch(self.values)
+        bound = math.e / sketch.width * sketch.total
+        for value, count in self.exact.items():
+            estimate = sketch.estimate(value)
+            self.assertGreaterEqual(estimate, count)
+            self.assertLessEqual(estimate - count, bound)
+
+    def test_merge(self):
+        """Merged halves equal the single-pass sketch"""
+        single, merged = CountMinSketch(512, 5), CountMinSketch(512, 5)
+        single.update_batch(self.values)
+        for half in chunks(self.values, 25000):
+            part = CountMinSketch(512, 5)
+            part.update_batch(half)
+            merged.merge(part)
+        self.assertEqual(merged.table, single.table)
+        self.assertEqual(merged.total, single.total)
+        with self.assertRaises(ValueError):
+            merged.merge(CountMinSketch(256, 5))
+
+
+class TestTopK(unittest.TestCase):
+    """TopK over a skewed stream of names"""
+
+    def setUp(self):
+        rng = random.Random(11)
+        self.values = [f'name-{int(rng.paretovariate(1.0))}' for _ in range(40000)]
+        rng.shuffle(self.values)
+        self.exact = Counter(self.values)
+
+    def assertSound(self, top_k):
+        """Every tracked count brackets the true one; heavy hitters are tracked"""
+        self.assertEqual(top_k.total, len(self.values))
+        for value, count, error in top_k.top(top_k.capacity):
+            self.assertLessEqual(count - error, self.exact[value])
+            self.assertGreaterEqual(count, self.exact[value])
+        threshold = len(self.values) / top_k.capacity
+        for value, count in self.exact.items():
+            if count > threshold:
+                self.assertIn(value, top_k.counts)
+
+    def test_single_pass(self):
+        """Space-Saving bounds on one pass"""
+        top_k = TopK(capacity=20)
+        for batch in chunks(self.values, 1000):
+            top_k.update_batch(batch)
+        self.assertSound(top_k)
+        self.assertEqual(top_k.top(1)[0][0], self.exact.most_common(1)[0][0])
+
+    def test_merge(self):
+        """Merged summaries of four parts keep the same guarantees"""
+        merged = TopK(capacity=20)
+        for part_values in chunks(self.values, 10000):
+            part = TopK(capacity=20)
+            part.update_batch(part_values)
+            merged.merge(part)
+        self.assertSound(merged)
+        self.assertEqual(merged.top(1)[0][0], self.exact.most_common(1)[0][0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Unit tests for stats.py
+
+Covers:
+- RunningStats moments against exact values, value by value, by batch
+  and merged from partial results
+- TDigest quantiles against the exact order statistics, single-pass and
+  merged
+- Histogram counts and merging
+Each is run on the pure Python path and, when it is installed, NumPy's.
+"""
+
+import bisect
+import math
+import random
+import statistics
+import unittest
+from unittest.mock import patch
+import stats
+from stats import Histogram, RunningStats, StreamStatistics, TDigest
+
+SEED = 1234
+
+
+def sample(n=20000, seed=SEED):
+    """Ages spread like user_data's, plus a few exact edge values"""
+    rng = random.Random(seed)
+    values = [round(rng.uniform(18, 100), 2) for _ in range(n)]
+    return values + [0.0, 18.0, 100.0]
+
+
+def chunks(values, size):
+    return [values[i:i + size] for i in range(0, len(values), size)]
+
+
+class PurePython:
+    """Runs the tests with stats.np patched out"""
+
+    def setUp(self):
+        patcher = patch.object(stats, 'np', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        super().setUp()
+
+
+@unittest.skipIf(stats.np is None, "NumPy is not installed")
+class WithNumPy:
+    """Runs the tests on the NumPy paths"""
+
+
+class RunningStatsTests:
+    """RunningStats against statistics.fmean / pvariance"""
+
+    def setUp(self):
+        super().setUp()
+        self.values = sample()
+
+    def assertMoments(self, moments):
+        self.assertEqual(moments.count, len(self.values))
+        self.assertAlmostEqual(moments.mean, statistics.fmean(self.values), places=9)
+        self.assertAlmostEqual(moments.variance, statistics.pvariance(self.values), places=6)
+        self.assertEqual(moments.min, min(self.values))
+        self.assertEqual(moments.max, max(self.values))
+
+    def test_update(self):
+        """Welford's update, one value at a time"""
+        moments = RunningStats()
+        for value in self.values:
+            moments.update(value)
+        self.assertMoments(moments)
+
+    def test_update_batch(self):
+        """Batches of uneven size fold in exactly"""
+        moments = RunningStats()
+        for batch in chunks(self.values, 777):
+            moments.update_batch(batch)
+        self.assertMoments(moments)
+
+    def test_merge(self):
+        """Partial results merged give the single-pass result"""
+        parts = []
+        for batch in chunks(self.values, 3001):
+            part = RunningStats()
+            part.update_batch(batch)
+            parts.append(part)
+        merged = RunningStats()
+        for part in parts:
+            merged.merge(part)
+        merged.merge(RunningStats())  # merging an empty one changes nothing
+        self.assertMoments(merged)
+
+    def test_small(self):
+        """Empty and single-value streams"""
+        moments = RunningStats()
+        moments.update_batch([])
+        self.assertEqual((moments.count, moments.variance), (0, 0.0))
+        moments.update(42)
+        self.assertEqual((moments.mean, moments.variance, moments.stddev), (42.0, 0.0, 0.0))
+
+
+class TDigestTests:
+    """TDigest quantiles against the exact order statistics"""
+
+    quantiles = (0.001, 0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99, 0.999)
+
+    def setUp(self):
+        super().setUp()
+        self.values = sample()
+        self.ordered = sorted(self.values)
+
+    def assertQuantiles(self, digest):
+        """The estimate's rank in the data is within 1% of q"""
+        n = len(self.ordered)
+        for q in self.quantiles:
+            with self.subTest(q=q):
+                estimate = digest.quantile(q)
+                low = bisect.bisect_left(self.ordered, estimate) / n
+                high = bisect.bisect_right(self.ordered, estimate) / n
+                self.assertLessEqual(low - 0.01, q)
+                self.assertGreaterEqual(high + 0.01, q)
+        self.assertEqual(digest.quantile(0), self.ordered[0])
+        self.assertEqual(digest.quantile(1), self.ordered[-1])
+
+    def test_single_pass(self):
+        """One digest fed batch by batch"""
+        digest = TDigest()
+        for batch in chunks(self.values, 1000):
+            digest.update_batch(batch)
+        self.assertEqual(digest.count, len(self.values))
+        self.assertQuantiles(digest)
+
+    def test_update(self):
+        """One digest fed value by value"""
+        digest = TDigest()
+        for value in self.values:
+            digest.update(value)
+        self.assertQuantiles(digest)
+
+    def test_merge(self):
+        """Digests of the parts merged are as accurate as one digest"""
+        merged = TDigest()
+        for batch in chunks(self.values, 2500):
+            part = TDigest()
+            part.update_batch(batch)
+            merged.merge(part)
+        self.assertEqual(merged.count, len(self.values))
+        self.assertQuantiles(merged)
+
+    def test_bounded_size(self):
+        """Compression keeps the centroid count near compression"""
+        digest = TDigest(compression=100)
+        digest.update_batch(self.values)
+        digest.quantile(0.5)
+        self.assertLessEqual(len(digest._means), 2 * 100)
+
+    def test_empty_and_invalid(self):
+        """nan with no data, ValueError for q outside [0, 1]"""
+        digest = TDigest()
+        self.assertTrue(math.isnan(digest.quantile(0.5)))
+        digest.update(1)
+        with self.assertRaises(ValueError):
+            digest.quantile(1.5)
+
+
+class HistogramTests:
+    """Histogram counts against a bin-by-bin count"""
+
+    def setUp(self):
+        super().setUp()
+        self.values = sample() + [-5.0, 100.0, 250.0]
+
+    def expected(self, low=0, high=100, bins=20):
+        """Bin counts, underflow and overflow counted one value at a time"""
+        width = (high - low) / bins
+        counts = [0] * bins
+        for value in self.values:
+            if low <= value < high:
+                counts[int((value - low) / width)] += 1
+        underflow = sum(value < low for value in self.values)
+        overflow = sum(value >= high for value in self.values)
+        return counts, underflow, overflow
+
+    def test_counts(self):
+        """Bins are half-open; high itself is an overflow"""
+        histogram = Histogram(0, 100, 20)
+        histogram.update_batch(self.values)
+        counts, underflow, overflow = self.expected()
+        self.assertEqual(histogram.counts, counts)
+        self.assertEqual((histogram.underflow, histogram.overflow), (underflow, overflow))
+        self.assertEqual(underflow, 1)
+        self.assertGreaterEqual(overflow, 3)  # 100.0 twice, and 250.0
+        self.assertEqual(histogram.edges()[::10], [0, 50, 100])
+
+    def test_merge(self):
+        """Merged histograms add up to the single-pass one"""
+        merged = Histogram(0, 100, 20)
+        for batch in chunks(self.values, 4000):
+            part = Histogram(0, 100, 20)
+            part.update_batch(batch)
+            merged.merge(part)
+        counts, underflow, overflow = self.expected()
+        self.assertEqual(merged.counts, counts)
+        self.assertEqual((merged.underflow, merged.overflow), (underflow, overflow))
+
+    def test_merge_mismatch(self):
+        """Histograms with different bins don't merge"""
+        with self.assertRaises(ValueError):
+            Histogram(0, 100, 20).merge(Histogram(0, 100, 10))
+
+
+class StreamStatisticsTests:
+    """StreamStatistics merged from parts matches a single pass"""
+
+    def test_merge(self):
+        values = sample()
+        single = StreamStatistics()
+        single.update_batch(values)
+        merged = StreamStatistics()
+        for batch in chunks(values, 5000):
+            part = StreamStatistics()
+            part.update_batch(batch)
+            merged.merge(part)
+        expected, actual = single.summary(), merged.summary()
+        self.assertEqual(actual['count'], expected['count'])
+        self.assertEqual(actual['histogram'], expected['histogram'])
+        self.assertAlmostEqual(actual['mean'], expected['mean'], places=9)
+        self.assertAlmostEqual(actual['stddev'], expected['stddev'], places=9)
+        for key in ('p50', 'p95', 'p99'):
+            self.assertAlmostEqual(actual[key], expected[key], delta=1.0)
+
+
+class TestRunningStats(PurePython, RunningStatsTests, unittest.TestCase):
+    """RunningStats, pure Python"""
+
+
+class TestRunningStatsNumPy(WithNumPy, RunningStatsTests, unittest.TestCase):
+    """RunningStats, NumPy"""
+
+
+class TestTDigest(PurePython, TDigestTests, unittest.TestCase):
+    """TDigest, pure Python"""
+
+
+class TestTDigestNumPy(WithNumPy, TDigestTests, unittest.TestCase):
+    """TDigest, NumPy"""
+
+
+class TestHistogram(PurePython, HistogramTests, unittest.TestCase):
+    """Histogram, pure Python"""
+
+
+class TestHistogramNumPy(WithNumPy, HistogramTests, unittest.TestCase):
+    """Histogram, NumPy"""
+
+
+class TestStreamStatistics(PurePython, StreamStatisticsTests, unittest.TestCase):
+    """StreamStatistics, pure Python"""
+
+
+class TestStreamStatisticsNumPy(WithNumPy, StreamStatisticsTests, unittest.TestCase):
+    """StreamStatistics, NumPy"""
+
+
+if __name__ == '__main__':
+    unittest.main()